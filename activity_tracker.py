@@ -0,0 +1,58 @@
+"""
+Coalesced last_active tracking
+
+Login and activity pings record "user was active now" in memory instead of
+issuing an update_one each time. Every ACTIVITY_FLUSH_INTERVAL seconds the
+latest timestamp per user is written with one bulk_write. Each update is
+conditional on the stored value being older than ACTIVITY_GRANULARITY
+seconds, and touches whose known stored value is already that recent are
+dropped before they are buffered, so an active user costs at most one write
+per granularity window. The 24-hour recent_users statistic is unaffected
+beyond that granularity.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+from background import BufferedWriter
+
+logger = logging.getLogger(__name__)
+
+
+class LastActiveTracker(BufferedWriter):
+    thread_name = 'last-active-flusher'
+
+    def __init__(self, write, flush_interval=None, granularity=None):
+        super().__init__(flush_interval or float(os.getenv('ACTIVITY_FLUSH_INTERVAL', 30)))
+        # write(updates, granularity) persists {(field, value): timestamp}
+        self.write = write
+        self.granularity = timedelta(seconds=granularity or float(os.getenv('ACTIVITY_GRANULARITY', 60)))
+        self.touches = 0
+        self.skipped = 0
+        self.flushed = 0
+
+    def touch(self, field, value, known_last_active=None):
+        """Record activity for the user matching {field: value}"""
+        now = datetime.utcnow()
+        self.touches += 1
+        if known_last_active is not None and now - known_last_active < self.granularity:
+            self.skipped += 1
+            return
+
+        self.ensure_flusher()
+        with self._lock:
+            self._pending[(field, value)] = now
+
+    def write_pending(self, pending):
+        try:
+            self.write(pending, self.granularity)
+            self.flushed += len(pending)
+        except Exception as e:
+            logger.error(f"Error flushing last_active updates: {e}")
+
+    def stats(self):
+        return {
+            'pending': self.pending_count,
+            'touches': self.touches,
+            'skipped': self.skipped,
+            'flushed': self.flushed
+        }
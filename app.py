@@ -1,41 +1,74 @@
-from flask import Flask, request, jsonify, render_template, session, redirect, url_for
+from flask import Flask, request, jsonify, render_template, session, redirect, url_for, g, Response, stream_with_context
 from flask_cors import CORS
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
+import time
 import uuid
-from dotenv import load_dotenv
+import json
+import base64
 from functools import wraps
-import razorpay
 import hmac
 import hashlib
-import requests
+from concurrent.futures import ThreadPoolExecutor
+from upstream import UpstreamClient, UpstreamError
+from summary_cache import SummaryCache, summary_cache_key, PROFILE_FIELDS
+from single_flight import SingleFlight
+from circuit_breaker import CircuitBreaker
+from hedging import HedgedCaller
+from job_queue import JobQueue
+from rollups import GRANULARITIES, bucket_start, fill_series, to_naive_utc
+from structured_logging import configure_logging, log_event
+from metrics import REGISTRY, UPSTREAM_REQUESTS, UPSTREAM_LATENCY, instrument_flask
+from lazy import LazyObject
 
-# Load environment variables from .env file
-load_dotenv()
+# Heavy dependencies (pymongo, bcrypt, razorpay, requests) are imported on
+# first use rather than here, so a serverless cold start that only serves
+# /health stays cheap. `python -m benchmarks.import_time` tracks this.
+
+# Load environment variables from .env file (deployments that set them in
+# the platform have none, and skip importing dotenv)
+if os.path.exists(os.path.join(os.path.dirname(os.path.abspath(__file__)), '.env')):
+    from dotenv import load_dotenv
+    load_dotenv()
+
+# Configure logging before anything else logs
+configure_logging()
 
 # Initialize Flask app first
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
 CORS(app, supports_credentials=True)
+instrument_flask(app)
 
-# Initialize database after environment variables are loaded
-try:
+def create_database():
     from database import initialize_database
-    db = initialize_database()
-except Exception as e:
-    print(f"Database initialization error: {e}")
-    db = None
+    # Connects on a background thread so startup never waits on MongoDB
+    return initialize_database(background=True)
+
+# Created on first use (see warm_up() for long-running servers)
+db = LazyObject(create_database, 'database')
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Free trial configuration
 FREE_TRIAL_LIMIT = int(os.getenv('FREE_TRIAL_LIMIT', 3))
 
+# End-to-end latency budget for a generation before falling back to templates
+GENERATION_DEADLINE_SECONDS = float(os.getenv('GENERATION_DEADLINE_SECONDS', 15))
+
+# Batch generation limits
+BATCH_MAX_PROFILES = int(os.getenv('BATCH_MAX_PROFILES', 100))
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 8))
+
+# Upper bound on buckets returned by /api/admin/stats/timeseries
+TIMESERIES_MAX_BUCKETS = int(os.getenv('TIMESERIES_MAX_BUCKETS', 2000))
+
 # Custom Resume Summary API Configuration
-RESUME_API_URL = "https://ufc6ri782h.execute-api.ap-south-1.amazonaws.com/StageOneResumeSummaryText/ProdEasyJobsResumeSummary"
+RESUME_API_URL = os.getenv(
+    'RESUME_API_URL',
+    "https://ufc6ri782h.execute-api.ap-south-1.amazonaws.com/StageOneResumeSummaryText/ProdEasyJobsResumeSummary"
+)
 CUSTOM_API_KEY = os.getenv('CUSTOM_API_KEY')
 
 if not CUSTOM_API_KEY:
@@ -45,33 +78,97 @@ else:
 
 logger.info("Resume Summary API endpoint configured")
 
-# Initialize Razorpay client
+# Pooled keep-alive session for the upstream API (one per worker process)
+upstream_client = UpstreamClient()
+
+# Two-tier cache of generated summaries keyed on the normalized profile
+summary_cache = SummaryCache(db)
+
+# Coalesces concurrent identical upstream calls (optionally across workers)
+single_flight = SingleFlight(db)
+
+# Fails fast to template summaries while the upstream is down or slow
+upstream_breaker = CircuitBreaker()
+
+# Runs upstream calls under the latency budget, hedging slow ones once
+hedged_upstream = HedgedCaller()
+
+# Razorpay client, created on first use by the payment routes
 razorpay_key_id = os.getenv('RAZORPAY_KEY_ID')
 razorpay_key_secret = os.getenv('RAZORPAY_KEY_SECRET')
+razorpay_client = None
 
 if not razorpay_key_id or not razorpay_key_secret:
     logger.warning("Razorpay credentials not found in environment variables")
-    razorpay_client = None
-else:
-    razorpay_client = razorpay.Client(auth=(razorpay_key_id, razorpay_key_secret))
-    logger.info("Razorpay client initialized successfully")
+
+def get_razorpay_client():
+    """Return the Razorpay client, or None when credentials are missing"""
+    global razorpay_client
+    if razorpay_client is None and razorpay_key_id and razorpay_key_secret:
+        import razorpay
+        razorpay_client = razorpay.Client(auth=(razorpay_key_id, razorpay_key_secret))
+        logger.info("Razorpay client initialized successfully")
+    return razorpay_client
+
+def warm_up():
+    """Create the database (starting its background connect) and pre-open
+    the upstream connection ahead of the first request, and start polling
+    for shared jobs. Called by long-running servers (gunicorn
+    post_worker_init, local runs); serverless entry points skip it and
+    create both on demand."""
+    bool(db)
+    if os.getenv('UPSTREAM_PREWARM', 'true').lower() == 'true':
+        upstream_client.prewarm(RESUME_API_URL)
+    # Other workers' jobs (and those left by a worker that died) are picked
+    # up without waiting for this worker's first submit
+    if job_queue.backend_name == 'mongo':
+        job_queue.start()
+
+# How long an API request may wait for a connection still in progress
+# before getting 503 (0 = fail fast; serverless cold starts want a few seconds)
+DB_READY_WAIT_SECONDS = float(os.getenv('DB_READY_WAIT_SECONDS', 0))
+
+# API routes that answer without the database
+DATABASE_OPTIONAL_ENDPOINTS = {'health_check', 'readiness', 'debug_db'}
+
+@app.before_request
+def require_database():
+    """Fail fast with 503 while MongoDB is still connecting (or down)
+    rather than letting API calls wait on it or misreport missing users"""
+    if not request.path.startswith('/api/') or request.endpoint in DATABASE_OPTIONAL_ENDPOINTS:
+        return None
+    if not db or not db.ready.wait(DB_READY_WAIT_SECONDS):
+        return jsonify({
+            'success': False,
+            'error': 'Service is starting up, please retry shortly'
+        }), 503, {'Retry-After': '5'}
+    return None
+
+@app.teardown_request
+def flush_write_behind_buffers(error):
+    """Flush-per-request mode (flush intervals of 0, used on Vercel): write
+    buffered generations, rollups and last_active before the function is frozen"""
+    if db.lazy_loaded:
+        try:
+            db.flush_per_request()
+        except Exception as e:
+            logger.error(f"Error flushing write-behind buffers: {e}")
 
 def login_required(f):
     """Decorator to require login for protected routes"""
     @wraps(f)
     def decorated_function(*args, **kwargs):
-        logger.info(f"Login required check - Session contents: {dict(session)}")
         if 'user_id' not in session:
-            logger.info(f"No user_id in session, redirecting to auth")
+            log_event(logger, 'login_required_redirect', logging.DEBUG, endpoint=f.__name__)
             return redirect(url_for('auth_page'))
-        logger.info(f"User authenticated, proceeding to {f.__name__}")
+        log_event(logger, 'login_required_ok', logging.DEBUG, endpoint=f.__name__, user_id=session['user_id'])
         return f(*args, **kwargs)
     return decorated_function
 
 def get_current_user():
     """Get current logged-in user"""
     if 'user_id' not in session:
-        logger.info("No user_id in session")
+        log_event(logger, 'no_session_user', logging.DEBUG)
         return None
     
     if not db:
@@ -79,11 +176,14 @@ def get_current_user():
         return None
     
     user_id = session['user_id']
-    logger.info(f"Looking for user_id: {user_id}")
+    
+    # Memoize per request so repeated lookups cost a single read
+    if g.get('current_user_id') == user_id:
+        return g.current_user
     
     try:
         user = db.get_user_by_id(user_id)
-        logger.info(f"Database returned user: {user}")
+        log_event(logger, 'current_user_lookup', logging.DEBUG, user_id=user_id, found=user is not None)
         
         # If user not found in database, clear the invalid session
         if user is None:
@@ -91,6 +191,8 @@ def get_current_user():
             session.clear()
             return None
         
+        g.current_user_id = user_id
+        g.current_user = user
         return user
     except Exception as e:
         logger.error(f"Database error in get_current_user: {e}")
@@ -102,25 +204,32 @@ def health_simple():
     return jsonify({
         'status': 'ok',
         'message': 'Flask app is running',
-        'database': 'connected' if db else 'not connected'
+        'database': 'connected' if db.lazy_loaded and db.is_ready else 'not connected'
     })
 
+@app.route('/api/ready')
+def readiness():
+    """Readiness probe: 200 once MongoDB is connected and answering a
+    (cached) ping, 503 otherwise. /health stays a pure liveness check."""
+    database = db.readiness() if db else {'connected': False, 'ping_ok': False}
+    ready = database['ping_ok']
+    return jsonify({
+        'status': 'ready' if ready else 'not ready',
+        'database': database,
+        'upstream_prewarmed': upstream_client.prewarmed
+    }), 200 if ready else 503
+
 @app.route('/')
 def index():
     """Redirect to auth page if not logged in, else redirect to dashboard"""
-    logger.info(f"Index route - Session contents: {dict(session)}")
     if 'user_id' in session:
-        logger.info(f"User logged in, redirecting to dashboard")
         return redirect(url_for('dashboard'))
-    logger.info(f"No user logged in, redirecting to auth")
     return redirect(url_for('auth_page'))
 
 @app.route('/auth')
 def auth_page():
     """Serve the authentication page"""
-    logger.info(f"Auth route - Session contents: {dict(session)}")
     if 'user_id' in session:
-        logger.info(f"User already logged in from auth page, redirecting to dashboard")
         return redirect(url_for('dashboard'))
     return render_template('auth.html')
 
@@ -188,26 +297,27 @@ def signup():
             data['password']
         )
         
-        if result and 'error' in result:
+        # Errors come back as a dict, users as a view
+        if isinstance(result, dict):
             return jsonify({
                 'success': False,
                 'message': result['error']
-            }), 400
+            }), 503 if result.get('busy') else 400
         
         if result:
             # Set session
-            session['user_id'] = result['user_id']
-            session['user_name'] = result['name']
-            session['user_email'] = result['email']
+            session['user_id'] = result.user_id
+            session['user_name'] = result.name
+            session['user_email'] = result.email
             
-            logger.info(f"New user registered: {result['email']}")
+            log_event(logger, 'signup', user_id=result.user_id)
             
             return jsonify({
                 'success': True,
                 'message': 'Account created successfully!',
                 'user': {
-                    'name': result['name'],
-                    'email': result['email']
+                    'name': result.name,
+                    'email': result.email
                 }
             })
         else:
@@ -240,26 +350,27 @@ def login():
         result = db.authenticate_user(data['email'], data['password'])
         
         # Check for error response
-        if result and 'error' in result:
+        # Errors come back as a dict, users as a view
+        if isinstance(result, dict):
             return jsonify({
                 'success': False,
                 'message': result['error']
-            }), 401
+            }), 503 if result.get('busy') else 401
         
         if result:
             # Set session
-            session['user_id'] = result['user_id']
-            session['user_name'] = result['name']
-            session['user_email'] = result['email']
+            session['user_id'] = result.user_id
+            session['user_name'] = result.name
+            session['user_email'] = result.email
             
-            logger.info(f"User logged in: {result['email']}")
+            log_event(logger, 'login', user_id=result.user_id)
             
             return jsonify({
                 'success': True,
                 'message': 'Login successful!',
                 'user': {
-                    'name': result['name'],
-                    'email': result['email']
+                    'name': result.name,
+                    'email': result.email
                 }
             })
         else:
@@ -292,9 +403,7 @@ def clear_session():
 def get_usage_status():
     """Get current usage status for the logged-in user"""
     try:
-        logger.info("get_usage_status called")
         user = get_current_user()
-        logger.info(f"get_current_user returned: {user}")
         
         if not user:
             logger.error("User not found in get_usage_status, session cleared")
@@ -304,16 +413,17 @@ def get_usage_status():
         result = {
             'success': True,
             'data': {
-                'usage_count': user.get('usage_count', 0),
+                'usage_count': user.usage_count,
                 'limit': FREE_TRIAL_LIMIT,
-                'remaining': max(0, FREE_TRIAL_LIMIT - user.get('usage_count', 0)),
-                'is_premium': user.get('is_premium', False),
-                'is_limited': user.get('usage_count', 0) >= FREE_TRIAL_LIMIT and not user.get('is_premium', False),
-                'user_name': user.get('name', ''),
-                'user_email': user.get('email', '')
+                'remaining': max(0, FREE_TRIAL_LIMIT - user.usage_count),
+                'is_premium': user.is_premium,
+                'is_limited': user.usage_count >= FREE_TRIAL_LIMIT and not user.is_premium,
+                'user_name': user.name,
+                'user_email': user.email
             }
         }
-        logger.info(f"Returning usage status: {result}")
+        log_event(logger, 'usage_status', logging.DEBUG, user_id=user.user_id,
+                  usage_count=result['data']['usage_count'], is_premium=result['data']['is_premium'])
         return jsonify(result)
     except Exception as e:
         logger.error(f"Error in get_usage_status: {e}")
@@ -327,49 +437,47 @@ def generate_summary():
     Expected input format matches the requirements.txt structure
     """
     try:
-        # Get current user and check usage limits
-        user = get_current_user()
+        user, data, error_response = begin_generation()
+        if error_response:
+            return error_response
+        is_premium = user.is_premium
         
-        if not user:
-            return jsonify({'success': False, 'error': 'User not found'}), 404
-            
-        # Check if user has exceeded free trial limit
-        if not user.get('is_premium', False) and user.get('usage_count', 0) >= FREE_TRIAL_LIMIT:
+        # Async mode: hand the slot-holding request to the job queue
+        if request.args.get('async') in ('1', 'true'):
+            try:
+                job_id = job_queue.submit(user.user_id, {
+                    'data': data,
+                    'is_premium': is_premium,
+                    'usage_info': build_usage_info(user)
+                })
+            except Exception:
+                # The job was never queued, so nothing will use the slot
+                if not is_premium:
+                    db.release_usage(user.user_id)
+                raise
+            logger.info(f"Queued generation job {job_id} for user {user.user_id}")
             return jsonify({
-                'success': False,
-                'error': 'free_trial_exceeded',
-                'message': 'You have reached your free trial limit of 3 generations. Upgrade to Premium for unlimited access!',
-                'usage_count': user.get('usage_count', 0),
-                'limit': FREE_TRIAL_LIMIT
-            }), 429  # Too Many Requests
-        
-        # Get data from request
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['current_job_title', 'job_description', 'years_experience', 
-                          'achievements', 'technical_skills', 'education']
-        
-        for field in required_fields:
-            if field not in data or not data[field]:
-                return jsonify({
-                    'success': False,
-                    'error': f'Missing required field: {field}'
-                }), 400
+                'success': True,
+                'job_id': job_id,
+                'status': 'queued',
+                'status_url': url_for('get_job', job_id=job_id)
+            }), 202
         
         # Log the request
-        logger.info(f"Generating summary for user {user.get('user_id')}, job title: {data['current_job_title']}")
+        logger.info(f"Generating summary for user {user.user_id}, job title: {data['current_job_title']}")
         
         # Generate three different versions of resume summaries
-        summaries = generate_resume_summaries(data)
+        try:
+            summaries, source = generate_resume_summaries(data)
+        except Exception:
+            # Refund the reserved slot so a failed generation is not charged
+            if not is_premium:
+                db.release_usage(user.user_id)
+            raise
         
-        # Increment usage count for non-premium users
-        if not user.get('is_premium', False):
-            db.increment_usage(user['user_id'])
-            # Log the generation
-            db.log_generation(user['user_id'], data, summaries)
-            # Get updated user data
-            user = db.get_user_by_id(user['user_id'])
+        # Log the generation for non-premium users
+        if not is_premium:
+            db.log_generation(user.user_id, data, summaries, source)
         
         # Response format matching requirements.txt
         response = {
@@ -379,11 +487,9 @@ def generate_summary():
                 "v2": summaries[1], 
                 "v3": summaries[2]
             },
-            "usage_info": {
-                "usage_count": user.get('usage_count', 0),
-                "remaining": max(0, FREE_TRIAL_LIMIT - user.get('usage_count', 0)) if not user.get('is_premium', False) else "unlimited",
-                "is_premium": user.get('is_premium', False)
-            }
+            "cached": source == 'cache',
+            "degraded": source == 'template',
+            "usage_info": build_usage_info(user)
         }
         
         return jsonify(response)
@@ -395,29 +501,439 @@ def generate_summary():
             'error': 'Internal server error'
         }), 500
 
-def generate_resume_summaries(data):
+def run_generation_job(job):
+    """Job queue handler: generate, record and return the response payload"""
+    payload = job['payload']
+    data = payload['data']
+    user_id = job['user_id']
+    
+    try:
+        summaries, source = generate_resume_summaries(data)
+    except Exception:
+        # Refund the slot reserved when the job was submitted
+        if not payload['is_premium']:
+            db.release_usage(user_id)
+        raise
+    
+    if not payload['is_premium']:
+        db.log_generation(user_id, data, summaries, source)
+    
+    return {
+        'data': {'v1': summaries[0], 'v2': summaries[1], 'v3': summaries[2]},
+        'cached': source == 'cache',
+        'degraded': source == 'template',
+        'usage_info': payload['usage_info']
+    }
+
+# Background generation jobs for /api/generate-summary?async=1
+job_queue = JobQueue(run_generation_job, db)
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """Poll the status and result of an async generation job"""
+    job = job_queue.get(job_id)
+    
+    # Jobs are only visible to the user who submitted them
+    if not job or job.get('user_id') != session['user_id']:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    
+    return jsonify({
+        'success': True,
+        'job_id': job_id,
+        'status': job['status'],
+        'result': job.get('result'),
+        'error': job.get('error'),
+        'created_at': job['created_at'].isoformat()
+    })
+
+@app.route('/api/generations', methods=['GET'])
+@login_required
+def generation_history():
+    """
+    Paginated generation history for the logged-in user, newest first
+    Pass the returned next_cursor as ?cursor= to fetch the following page
+    """
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 100)
+    except ValueError:
+        return jsonify({'success': False, 'error': 'limit must be an integer'}), 400
+    
+    before = None
+    if request.args.get('cursor'):
+        before = decode_history_cursor(request.args['cursor'])
+        if before is None:
+            return jsonify({'success': False, 'error': 'Invalid cursor'}), 400
+    
+    items, next_key = db.get_generation_history(session['user_id'], limit, before)
+    
+    return jsonify({
+        'success': True,
+        'data': [
+            {
+                'generation_id': item.get('generation_id'),
+                'timestamp': item['timestamp'].isoformat(),
+                'job_title': item.get('input_data', {}).get('current_job_title', ''),
+                'summaries': item.get('generated_summaries', [])
+            }
+            for item in items
+        ],
+        'next_cursor': encode_history_cursor(next_key) if next_key else None
+    })
+
+def encode_history_cursor(key):
+    """Opaque cursor for the (timestamp, _id) of the last item on a page"""
+    timestamp, last_id = key
+    raw = f"{timestamp.isoformat()}|{last_id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_history_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+        timestamp, last_id = raw.split('|', 1)
+        from bson import ObjectId
+        return datetime.fromisoformat(timestamp), ObjectId(last_id)
+    except Exception:
+        return None
+
+@app.route('/api/generate-summary/stream', methods=['POST'])
+@login_required
+def generate_summary_stream():
+    """
+    Streaming variant of /api/generate-summary using Server-Sent Events
+    Emits one 'summary' event per variant as soon as it is available, then a
+    'usage' event and a final 'done' event. Validation and quota errors are
+    returned as regular JSON responses before the stream starts.
+    """
+    try:
+        user, data, error_response = begin_generation()
+        if error_response:
+            return error_response
+        is_premium = user.is_premium
+    except Exception as e:
+        logger.error(f"Error starting summary stream: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+    
+    logger.info(f"Streaming summary for user {user.user_id}, job title: {data['current_job_title']}")
+    
+    def stream():
+        # Whether the reserved slot has been recorded or refunded
+        settled = False
+        try:
+            # Flush headers right away so the client knows generation started
+            yield ': generating\n\n'
+            
+            try:
+                summaries, source = generate_resume_summaries(data)
+            except Exception as e:
+                logger.error(f"Error generating streamed summary: {str(e)}")
+                if not is_premium:
+                    db.release_usage(user.user_id)
+                settled = True
+                yield sse_event('error', {'success': False, 'error': 'Internal server error'})
+                return
+            
+            # Record before streaming, so a client that disconnects part-way
+            # is not left with a charged slot and no logged generation
+            if not is_premium:
+                db.log_generation(user.user_id, data, summaries, source)
+            settled = True
+            
+            for version, summary in zip(('v1', 'v2', 'v3'), summaries):
+                yield sse_event('summary', {'version': version, 'summary': summary, 'source': source})
+            
+            yield sse_event('usage', {
+                'cached': source == 'cache',
+                'degraded': source == 'template',
+                'usage_info': build_usage_info(user)
+            })
+            yield sse_event('done', {'success': True})
+        except GeneratorExit:
+            # Client went away before anything was generated
+            if not settled and not is_premium:
+                db.release_usage(user.user_id)
+            raise
+    
+    return Response(
+        stream_with_context(stream()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def sse_event(event, payload):
+    """Format one Server-Sent Events frame"""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+@app.route('/api/generate-summary/batch', methods=['POST'])
+@login_required
+def generate_summary_batch():
+    """
+    Generate summaries for a list of profiles in one call
+    Expects {"profiles": [...]} where each profile matches /api/generate-summary
+    """
+    try:
+        user = get_current_user()
+        
+        if not user:
+            return jsonify({'success': False, 'error': 'User not found'}), 404
+        
+        data = request.get_json() or {}
+        profiles = data.get('profiles')
+        if not isinstance(profiles, list) or not profiles:
+            return jsonify({
+                'success': False,
+                'error': 'profiles must be a non-empty list'
+            }), 400
+        
+        if len(profiles) > BATCH_MAX_PROFILES:
+            return jsonify({
+                'success': False,
+                'error': f'Batch too large, maximum is {BATCH_MAX_PROFILES} profiles'
+            }), 400
+        
+        # Validate every item up front; invalid items are reported, not charged
+        results = [None] * len(profiles)
+        valid_indexes = []
+        for index, profile in enumerate(profiles):
+            missing_field = find_missing_profile_field(profile) if isinstance(profile, dict) else 'profile'
+            if missing_field:
+                results[index] = {
+                    'index': index,
+                    'success': False,
+                    'error': f'Missing required field: {missing_field}'
+                }
+            else:
+                valid_indexes.append(index)
+        
+        # Reserve quota for all valid items in a single atomic update
+        if valid_indexes:
+            user, error_response = reserve_generation_slots(user, count=len(valid_indexes))
+            if error_response:
+                return error_response
+        is_premium = user.is_premium
+        
+        logger.info(f"Generating batch of {len(valid_indexes)} summaries for user {user.user_id}")
+        
+        # Fan out to the upstream through a bounded pool
+        generated = []
+        if valid_indexes:
+            with ThreadPoolExecutor(max_workers=min(BATCH_CONCURRENCY, len(valid_indexes))) as executor:
+                futures = {
+                    executor.submit(generate_resume_summaries, profiles[index]): index
+                    for index in valid_indexes
+                }
+                for future, index in futures.items():
+                    try:
+                        summaries, source = future.result()
+                    except Exception as e:
+                        logger.error(f"Batch item {index} failed: {str(e)}")
+                        results[index] = {'index': index, 'success': False, 'error': 'Generation failed'}
+                        continue
+                    generated.append((profiles[index], summaries, source))
+                    results[index] = {
+                        'index': index,
+                        'success': True,
+                        'data': {'v1': summaries[0], 'v2': summaries[1], 'v3': summaries[2]},
+                        'cached': source == 'cache',
+                        'degraded': source == 'template'
+                    }
+        
+        if not is_premium:
+            # Refund slots for items that failed during generation
+            failed = len(valid_indexes) - len(generated)
+            if failed:
+                user = db.release_usage(user.user_id, count=failed) or user
+            db.log_generations(user.user_id, generated)
+        
+        return jsonify({
+            'success': True,
+            'results': results,
+            'succeeded': len(generated),
+            'failed': len(profiles) - len(generated),
+            'usage_info': build_usage_info(user)
+        })
+        
+    except Exception as e:
+        logger.error(f"Error generating summary batch: {str(e)}")
+        return jsonify({
+            'success': False,
+            'error': 'Internal server error'
+        }), 500
+
+def begin_generation():
+    """
+    Shared setup of /api/generate-summary and its streaming variant: look up
+    the user, check the quota, validate the profile and reserve a slot
+    Returns (user, data, None), or (None, None, error response)
+    """
+    user = get_current_user()
+    if not user:
+        return None, None, (jsonify({'success': False, 'error': 'User not found'}), 404)
+    
+    # Check if user has exceeded free trial limit
+    user = refresh_if_exhausted(user)
+    if not user.is_premium and user.usage_count >= FREE_TRIAL_LIMIT:
+        return None, None, free_trial_exceeded_response(user)
+    
+    # Validate required fields
+    data = request.get_json()
+    missing_field = find_missing_profile_field(data)
+    if missing_field:
+        return None, None, (jsonify({
+            'success': False,
+            'error': f'Missing required field: {missing_field}'
+        }), 400)
+    
+    # Reserve a free-trial slot up front; the check and increment are a
+    # single atomic update, so concurrent submissions cannot overspend
+    user, error_response = reserve_generation_slots(user)
+    if error_response:
+        return None, None, error_response
+    return user, data, None
+
+def find_missing_profile_field(data):
+    """Return the first required profile field that is missing or empty"""
+    for field in PROFILE_FIELDS:
+        if field not in data or not data[field]:
+            return field
+    return None
+
+def build_usage_info(user):
+    """Usage summary returned alongside generated summaries"""
+    return {
+        "usage_count": user.usage_count,
+        "remaining": max(0, FREE_TRIAL_LIMIT - user.usage_count) if not user.is_premium else "unlimited",
+        "is_premium": user.is_premium
+    }
+
+def refresh_if_exhausted(user):
+    """This worker's cached profile can miss an upgrade made on another
+    worker; re-read it before telling a user with no slots left to pay"""
+    if user.is_premium or user.usage_count < FREE_TRIAL_LIMIT:
+        return user
+    return db.get_user_by_id(user.user_id, fresh=True) or user
+
+def reserve_generation_slots(user, count=1):
+    """
+    Reserve `count` free-trial slots before generating
+    Returns (user to report usage for, None), or (None, error response):
+    429 when the quota is spent, 503 when MongoDB could not answer.
+    Premium users are returned as-is.
+    """
+    from database import DatabaseUnavailable
+    if user.is_premium:
+        return user, None
+    try:
+        reserved_user = db.reserve_usage(user.user_id, FREE_TRIAL_LIMIT, count=count)
+    except DatabaseUnavailable:
+        return None, database_unavailable_response()
+    if reserved_user is not None:
+        return reserved_user, None
+    
+    # Refused: confirm against a fresh read (the user may just have upgraded)
+    current_user = db.get_user_by_id(user.user_id, fresh=True)
+    if current_user is None:
+        return None, (jsonify({'success': False, 'error': 'User not found'}), 404)
+    if current_user.is_premium:
+        return current_user, None
+    remaining = max(0, FREE_TRIAL_LIMIT - current_user.usage_count)
+    if count > 1 and remaining > 0:
+        return None, batch_exceeds_free_trial_response(current_user, count, remaining)
+    return None, free_trial_exceeded_response(current_user)
+
+def database_unavailable_response():
+    return jsonify({
+        'success': False,
+        'error': 'Database temporarily unavailable, please retry shortly'
+    }), 503, {'Retry-After': '5'}
+
+def batch_exceeds_free_trial_response(user, requested, remaining):
+    return jsonify({
+        'success': False,
+        'error': 'batch_exceeds_free_trial',
+        'message': f'This batch needs {requested} generations but only {remaining} of your free trial remain. '
+                   f'Send at most {remaining} profiles, or upgrade to Premium for unlimited access.',
+        'requested': requested,
+        'remaining': remaining,
+        'usage_count': user.usage_count,
+        'limit': FREE_TRIAL_LIMIT
+    }), 429
+
+def free_trial_exceeded_response(user):
+    return jsonify({
+        'success': False,
+        'error': 'free_trial_exceeded',
+        'message': 'You have reached your free trial limit of 3 generations. Upgrade to Premium for unlimited access!',
+        'usage_count': user.usage_count,
+        'limit': FREE_TRIAL_LIMIT
+    }), 429  # Too Many Requests
+
+def generate_resume_summaries(data, deadline=None):
     """
     Generate three different versions of resume summaries using custom API
+    
+    Returns (summaries, source) where source is 'cache', 'api' or 'template'.
+    Only upstream results are cached, so an outage never pins template
+    summaries in the cache. The upstream gets at most `deadline` seconds
+    (GENERATION_DEADLINE_SECONDS by default) before templates are returned.
     """
     
-    job_title = data['current_job_title']
-    job_description = data['job_description'] 
-    years_experience = data['years_experience']
-    achievements = data['achievements']
-    technical_skills = data['technical_skills']
-    education = data['education']
+    deadline_at = time.monotonic() + (deadline or GENERATION_DEADLINE_SECONDS)
+    
+    cached = summary_cache.get(data)
+    if cached is not None:
+        record_generation_event('cache')
+        return cached, 'cache'
+    
+    # Try to use custom API first, fallback to templates. Identical
+    # concurrent requests share a single upstream call.
+    cache_key = summary_cache_key(data)
+    
+    def fetch_and_publish():
+        # Publish to the cache before the single-flight lease is released
+        summaries = upstream_breaker.call(lambda: hedged_upstream.call(
+            lambda: generate_custom_api_summaries(data),
+            deadline_at - time.monotonic()
+        ))
+        summary_cache.set(data, summaries)
+        return summaries
     
-    # Try to use custom API first, fallback to templates
     try:
-        return generate_custom_api_summaries(data)
+        summaries, shared = single_flight.do(
+            cache_key,
+            fetch_and_publish,
+            lookup=lambda: db.get_cached_summaries(cache_key) if db else None,
+            deadline=deadline_at - time.monotonic()
+        )
     except Exception as e:
         logger.error(f"Custom API error: {str(e)}, falling back to templates")
-        return generate_template_summaries(data)
+        UPSTREAM_REQUESTS.inc('fallback')
+        record_generation_event('template')
+        return generate_template_summaries(data), 'template'
+    
+    record_generation_event('api')
+    return summaries, 'api'
+
+def record_generation_event(source):
+    """Count a generation in the hourly/daily rollups (buffered in memory)"""
+    if db:
+        db.rollups.record_generation(source)
 
 def generate_custom_api_summaries(data):
     """
     Generate AI-powered resume summaries using custom AWS API
+    
+    Raises UpstreamError when the API is unreachable or its response cannot
+    be parsed; callers decide how to fall back. Each call is counted in
+    /metrics by outcome: success, bad_status, bad_shape, timeout or error.
     """
+    import requests
+    
+    started = time.perf_counter()
+    outcome = 'error'
     try:
         # Prepare payload for the custom API
         payload = {
@@ -441,67 +957,63 @@ def generate_custom_api_summaries(data):
             # headers['X-API-Key'] = CUSTOM_API_KEY
             # headers['api-key'] = CUSTOM_API_KEY
         
-        # Make request to custom API
-        response = requests.post(
+        # Make request to custom API over the pooled session; uses the
+        # configured (connect, read) timeouts
+        response = upstream_client.post(
             RESUME_API_URL,
             json=payload,
-            headers=headers,
-            timeout=30  # 30 second timeout
+            headers=headers
         )
         
         # Check if request was successful
         if response.status_code == 200:
             result = response.json()
+            raw = None
             
             # Assuming the API returns summaries in a specific format
             # Adjust this based on your actual API response structure
             if 'summaries' in result:
-                summaries = result['summaries']
-                if len(summaries) >= 3:
-                    return [
-                        clean_summary(summaries[0]),
-                        clean_summary(summaries[1]),
-                        clean_summary(summaries[2])
-                    ]
+                if len(result['summaries']) >= 3:
+                    raw = result['summaries']
             elif 'data' in result:
                 # If API returns data similar to OpenAI format
                 data_result = result['data']
                 if isinstance(data_result, dict):
-                    return [
-                        clean_summary(data_result.get('v1', '')),
-                        clean_summary(data_result.get('v2', '')),
-                        clean_summary(data_result.get('v3', ''))
-                    ]
+                    raw = [data_result.get('v1', ''), data_result.get('v2', ''), data_result.get('v3', '')]
                 elif isinstance(data_result, list) and len(data_result) >= 3:
-                    return [
-                        clean_summary(data_result[0]),
-                        clean_summary(data_result[1]),
-                        clean_summary(data_result[2])
-                    ]
+                    raw = data_result
             elif isinstance(result, list) and len(result) >= 3:
                 # If API directly returns an array of summaries
-                return [
-                    clean_summary(result[0]),
-                    clean_summary(result[1]),
-                    clean_summary(result[2])
-                ]
+                raw = result
+            
+            if raw is not None:
+                outcome = 'success'
+                return [clean_summary(raw[0]), clean_summary(raw[1]), clean_summary(raw[2])]
             
             # If we can't parse the response properly, log it and fallback
+            outcome = 'bad_shape'
             logger.warning(f"Unexpected API response format: {result}")
-            return generate_template_summaries(data)
+            raise UpstreamError("Unexpected API response format")
         else:
+            outcome = 'bad_status'
             logger.error(f"Custom API returned status code: {response.status_code}")
-            return generate_template_summaries(data)
+            raise UpstreamError(f"Custom API returned status code: {response.status_code}")
             
-    except requests.exceptions.Timeout:
+    except UpstreamError:
+        raise
+    except requests.exceptions.Timeout as e:
+        outcome = 'timeout'
         logger.error("Custom API request timed out")
-        return generate_template_summaries(data)
+        raise UpstreamError("Custom API request timed out") from e
     except requests.exceptions.RequestException as e:
         logger.error(f"Custom API request error: {str(e)}")
-        return generate_template_summaries(data)
+        raise UpstreamError(f"Custom API request error: {str(e)}") from e
     except Exception as e:
         logger.error(f"Unexpected error calling custom API: {str(e)}")
-        return generate_template_summaries(data)
+        raise UpstreamError(f"Unexpected error calling custom API: {str(e)}") from e
+    finally:
+        UPSTREAM_LATENCY.observe(time.perf_counter() - started, outcome)
+        UPSTREAM_REQUESTS.inc(outcome)
 
 def generate_template_summaries(data):
     """
@@ -560,7 +1072,7 @@ def upgrade_premium():
         # 3. Update user's premium status in database
         
         # Update premium status
-        success = db.upgrade_to_premium(user['user_id'])
+        success = db.upgrade_to_premium(user.user_id)
         if not success:
             return jsonify({'success': False, 'error': 'Failed to upgrade to premium'}), 500
         
@@ -582,6 +1094,7 @@ def upgrade_premium():
 def create_razorpay_order():
     """Create Razorpay order for premium subscription"""
     try:
+        razorpay_client = get_razorpay_client()
         if not razorpay_client:
             return jsonify({
                 'success': False, 
@@ -600,15 +1113,15 @@ def create_razorpay_order():
         # Create Razorpay order
         # Generate short receipt (max 40 chars for Razorpay)
         timestamp = str(int(datetime.now().timestamp()))[-8:]  # Last 8 digits of timestamp
-        receipt = f"prem_{user['user_id']}_{timestamp}"[:40]  # Ensure max 40 chars
+        receipt = f"prem_{user.user_id}_{timestamp}"[:40]  # Ensure max 40 chars
         
         order_data = {
             'amount': amount,
             'currency': currency,
             'receipt': receipt,
             'notes': {
-                'user_id': user['user_id'],
-                'username': user.get('username', user.get('name', '')),
+                'user_id': user.user_id,
+                'username': user.name,
                 'subscription_type': 'premium_monthly'
             }
         }
@@ -635,6 +1148,7 @@ def create_razorpay_order():
 def verify_razorpay_payment():
     """Verify Razorpay payment and upgrade user to premium"""
     try:
+        razorpay_client = get_razorpay_client()
         if not razorpay_client:
             return jsonify({
                 'success': False, 
@@ -668,7 +1182,7 @@ def verify_razorpay_payment():
             ).hexdigest()
             
             if expected_signature != razorpay_signature:
-                logger.warning(f"Payment signature verification failed for user {user['user_id']}")
+                logger.warning(f"Payment signature verification failed for user {user.user_id}")
                 return jsonify({
                     'success': False,
                     'error': 'Payment verification failed'
@@ -683,16 +1197,16 @@ def verify_razorpay_payment():
         
         # Payment verified successfully, upgrade user to premium
         try:
-            success = db.upgrade_to_premium(user['user_id'])
+            success = db.upgrade_to_premium(user.user_id)
             if not success:
-                logger.error(f"Failed to upgrade user {user['user_id']} to premium after successful payment")
+                logger.error(f"Failed to upgrade user {user.user_id} to premium after successful payment")
                 return jsonify({
                     'success': False,
                     'error': 'Failed to activate premium subscription'
                 }), 500
             
             # Log successful payment
-            logger.info(f"User {user['user_id']} successfully upgraded to premium. Payment ID: {razorpay_payment_id}")
+            logger.info(f"User {user.user_id} successfully upgraded to premium. Payment ID: {razorpay_payment_id}")
             
             return jsonify({
                 'success': True,
@@ -720,9 +1234,21 @@ def health_check():
     """Health check endpoint"""
     return jsonify({
         'status': 'healthy',
-        'timestamp': datetime.now().isoformat()
+        'timestamp': datetime.now().isoformat(),
+        'upstream': upstream_client.stats(),
+        'circuit_breaker': upstream_breaker.stats(),
+        'hedging': hedged_upstream.stats()
     })
 
+@app.route('/metrics')
+def metrics():
+    """Prometheus text exposition of this worker's request, MongoDB and
+    upstream metrics. Set METRICS_TOKEN to require a bearer token."""
+    token = os.getenv('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return jsonify({'error': 'Unauthorized'}), 401
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/admin/stats', methods=['GET'])
 def admin_stats():
     """Get usage statistics for admin (protected endpoint)"""
@@ -734,7 +1260,55 @@ def admin_stats():
     stats = db.get_usage_stats()
     return jsonify({
         'success': True,
-        'data': stats
+        'data': stats,
+        'user_cache': db.user_cache.stats(),
+        'summary_cache': summary_cache.stats(),
+        'single_flight': single_flight.stats(),
+        'jobs': job_queue.stats(),
+        'generation_log': db.generation_logger.stats(),
+        'indexes': db.index_manager.stats(),
+        'rollups': db.rollups.stats(),
+        'password_hasher': db.password_hasher.stats(),
+        'last_active': db.activity_tracker.stats()
+    })
+
+@app.route('/api/admin/stats/timeseries', methods=['GET'])
+def admin_stats_timeseries():
+    """
+    Hourly or daily series of signups, generations (by source) and upgrades
+    Query params: from, to (ISO 8601; naive values are UTC) and granularity (hour|day)
+    """
+    admin_key = request.headers.get('X-Admin-Key')
+    if admin_key != os.getenv('ADMIN_KEY', 'admin123'):
+        return jsonify({'error': 'Unauthorized'}), 401
+    
+    granularity = request.args.get('granularity', 'hour')
+    if granularity not in GRANULARITIES:
+        return jsonify({'success': False, 'error': 'granularity must be hour or day'}), 400
+    
+    try:
+        # Offsets are honoured and converted to the naive UTC the buckets use
+        end = to_naive_utc(datetime.fromisoformat(request.args['to'])) if request.args.get('to') else datetime.utcnow()
+        default_span = timedelta(days=1) if granularity == 'hour' else timedelta(days=30)
+        start = to_naive_utc(datetime.fromisoformat(request.args['from'])) if request.args.get('from') else end - default_span
+    except ValueError:
+        return jsonify({'success': False, 'error': 'from and to must be ISO 8601 dates'}), 400
+    
+    if start >= end:
+        return jsonify({'success': False, 'error': 'from must be before to'}), 400
+    if (end - start) / GRANULARITIES[granularity] > TIMESERIES_MAX_BUCKETS:
+        return jsonify({
+            'success': False,
+            'error': f'Range too large, maximum is {TIMESERIES_MAX_BUCKETS} buckets'
+        }), 400
+    
+    docs = db.get_rollups(granularity, bucket_start(start, granularity), end)
+    return jsonify({
+        'success': True,
+        'granularity': granularity,
+        'from': start.isoformat(),
+        'to': end.isoformat(),
+        'data': fill_series(docs, granularity, start, end)
     })
 
 @app.errorhandler(404)
@@ -750,4 +1324,5 @@ def internal_error(error):
 
 # For local development
 if __name__ == "__main__":
+    warm_up()
     app.run(debug=True, host='0.0.0.0', port=5000)
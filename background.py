@@ -0,0 +1,115 @@
+"""
+Per-process background work
+
+Threads do not survive a fork, so under gunicorn anything that runs on a
+background thread has to be started lazily, in the worker that uses it.
+These helpers track the pid that owns the thread (or pool) and start a new
+one when it changes:
+
+- PeriodicFlusher: base for write-behind buffers; flush() runs on a daemon
+  thread every flush_interval seconds (or when woken) and at exit. With
+  flush_interval 0 no thread is started and the owner flushes after each
+  request instead (serverless platforms freeze the process between
+  requests and may reclaim it without running atexit)
+- BufferedWriter: a PeriodicFlusher over a dict of pending updates that is
+  swapped out under the lock and handed to write_pending()
+- PerProcessExecutor: a ThreadPoolExecutor rebuilt after a fork
+"""
+import os
+import atexit
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class PeriodicFlusher:
+    # Name of the flusher thread, for thread dumps
+    thread_name = 'flusher'
+
+    def __init__(self, flush_interval):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher_pid = None
+
+        atexit.register(self.flush)
+
+    @property
+    def flush_per_request(self):
+        return self.flush_interval <= 0
+
+    def ensure_flusher(self):
+        """Start this process's flusher thread if it is not running yet"""
+        pid = os.getpid()
+        if self._flusher_pid == pid or self.flush_per_request:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            threading.Thread(target=self._flush_loop, name=self.thread_name, daemon=True).start()
+            self._flusher_pid = pid
+
+    def wake(self):
+        """Flush now instead of at the end of the interval"""
+        self._wakeup.set()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Error in {self.thread_name}: {e}")
+
+    def flush(self):
+        raise NotImplementedError
+
+
+class BufferedWriter(PeriodicFlusher):
+    def __init__(self, flush_interval):
+        super().__init__(flush_interval)
+        self._pending = {}
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.write_pending(pending)
+
+    def write_pending(self, pending):
+        raise NotImplementedError
+
+    @property
+    def pending_count(self):
+        with self._lock:
+            return len(self._pending)
+
+
+class PerProcessExecutor:
+    def __init__(self, max_workers, thread_name_prefix, on_create=None):
+        self.max_workers = max_workers
+        self.thread_name_prefix = thread_name_prefix
+        # Called (under the lock) whenever a new pool is built, to reset
+        # state that belongs with it
+        self.on_create = on_create
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """This process's pool, built on first use"""
+        pid = os.getpid()
+        if self._executor is None or self._pid != pid:
+            with self._lock:
+                if self._executor is None or self._pid != pid:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix=self.thread_name_prefix
+                    )
+                    if self.on_create is not None:
+                        self.on_create()
+                    self._pid = pid
+        return self._executor
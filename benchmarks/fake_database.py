@@ -0,0 +1,208 @@
+"""
+In-memory stand-in for Database
+
+Implements the Database methods the Flask app calls, backed by dicts under
+one lock, so the app can be benchmarked without MongoDB. Password hashing,
+the user cache, rollups, the generation logger and the last_active tracker
+are the real components; only their persistence callbacks are replaced.
+It has no job methods, so benchmarks/run.py pins JOB_QUEUE_BACKEND=local
+(the in-process queue) when it serves the app from it.
+"""
+import uuid
+import threading
+from datetime import datetime
+from database import Database
+from password_hasher import HasherBusy
+from user_views import AuthView, ProfileView
+
+
+class FakeDatabase(Database):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._users = {}
+        self._user_ids_by_email = {}
+        self._generations = []
+        self._summary_cache = {}
+        self._rollups = {}
+        super().__init__(build_indexes=False)
+
+    def connect(self):
+        self.client = None
+        self.db = None
+        self.ready.set()
+
+    def ping(self, max_age=None):
+        return True
+
+    def create_user_account(self, name, email, password):
+        with self._lock:
+            if email in self._user_ids_by_email:
+                return {"error": "An account with this email already exists."}
+        try:
+            password_hash = self.password_hasher.hash(password)
+        except HasherBusy:
+            return {"error": "Server is busy, please try again shortly.", "busy": True}
+
+        now = datetime.utcnow()
+        user = {
+            "user_id": str(uuid.uuid4()),
+            "name": name,
+            "email": email,
+            "password_hash": password_hash,
+            "created_at": now,
+            "last_active": now,
+            "usage_count": 0,
+            "is_premium": False
+        }
+        with self._lock:
+            if email in self._user_ids_by_email:
+                return {"error": "An account with this email already exists."}
+            self._users[user['user_id']] = user
+            self._user_ids_by_email[email] = user['user_id']
+        self.rollups.record('signups')
+        return ProfileView.from_document(user)
+
+    def authenticate_user(self, email, password):
+        with self._lock:
+            user = AuthView.from_document(self._users.get(self._user_ids_by_email.get(email)))
+        if not user:
+            return {"error": "Invalid email or password."}
+        try:
+            if not self.password_hasher.verify(password, user.password_hash):
+                return {"error": "Invalid email or password."}
+        except HasherBusy:
+            return {"error": "Server is busy, please try again shortly.", "busy": True}
+        self.activity_tracker.touch('email', email, user.last_active)
+        return user.replace(password_hash=None)
+
+    def get_user_by_id(self, user_id, fresh=False):
+        cached = None if fresh else self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        with self._lock:
+            user = ProfileView.from_document(self._users.get(user_id))
+        if user:
+            self.user_cache.set(user_id, user)
+        return user
+
+    def get_user_by_email(self, email):
+        with self._lock:
+            return ProfileView.from_document(self._users.get(self._user_ids_by_email.get(email)))
+
+    def _update_user(self, user_id, update):
+        """Apply update(user) -> bool under the lock; return the new
+        QuotaView, or None if the user is missing or update declined"""
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None or not update(user):
+                return None
+            document = dict(user)
+        return self._refresh_cached_quota(user_id, document)
+
+    def reserve_usage(self, user_id, limit, count=1):
+        if count > limit:
+            return None
+
+        def reserve(user):
+            if user.get('is_premium') or user.get('usage_count', 0) > limit - count:
+                return False
+            user['usage_count'] = user.get('usage_count', 0) + count
+            user['last_active'] = datetime.utcnow()
+            return True
+
+        return self._update_user(user_id, reserve)
+
+    def release_usage(self, user_id, count=1):
+        def release(user):
+            if user.get('usage_count', 0) < count:
+                return False
+            user['usage_count'] -= count
+            return True
+
+        return self._update_user(user_id, release)
+
+    def increment_usage(self, user_id):
+        def increment(user):
+            user['usage_count'] = user.get('usage_count', 0) + 1
+            return True
+
+        return self._update_user(user_id, increment) is not None
+
+    def upgrade_to_premium(self, user_id):
+        with self._lock:
+            user = self._users.get(user_id)
+            if user is None:
+                return False
+            was_premium = user.get('is_premium', False)
+            user['is_premium'] = True
+            user['upgraded_at'] = datetime.utcnow()
+        self.user_cache.invalidate(user_id)
+        if not was_premium:
+            self.rollups.record('premium_upgrades')
+        return True
+
+    def log_generations(self, user_id, entries):
+        if not entries:
+            return False
+        now = datetime.utcnow()
+        docs = [
+            self._generation_doc(user_id, data, summaries, source, now)
+            for data, summaries, source in entries
+        ]
+        return all([self.generation_logger.log(doc) for doc in docs])
+
+    def write_generations(self, generation_docs, write_concern=None):
+        with self._lock:
+            for doc in generation_docs:
+                self._generations.append(dict(doc, _id=len(self._generations)))
+
+    def get_generation_history(self, user_id, limit=20, before=None):
+        with self._lock:
+            items = [doc for doc in self._generations if doc['user_id'] == user_id]
+        items.sort(key=lambda doc: (doc['timestamp'], doc['_id']), reverse=True)
+        if before is not None:
+            items = [doc for doc in items if (doc['timestamp'], doc['_id']) < before]
+        next_key = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_key = (items[-1]['timestamp'], items[-1]['_id'])
+        return items, next_key
+
+    def get_cached_summaries(self, cache_key):
+        with self._lock:
+            return self._summary_cache.get(cache_key)
+
+    def store_cached_summaries(self, cache_key, summaries):
+        with self._lock:
+            self._summary_cache[cache_key] = summaries
+        return True
+
+    def get_usage_stats(self):
+        with self._lock:
+            return {
+                'total_users': len(self._users),
+                'premium_users': sum(1 for user in self._users.values() if user.get('is_premium')),
+                'total_generations': len(self._generations)
+            }
+
+    def write_last_active(self, updates, granularity):
+        with self._lock:
+            for (field, value), timestamp in updates.items():
+                for user in self._users.values():
+                    if user.get(field) == value:
+                        user['last_active'] = max(user.get('last_active', timestamp), timestamp)
+
+    def write_rollups(self, pending):
+        with self._lock:
+            for (granularity, bucket), counts in pending.items():
+                doc = self._rollups.setdefault(
+                    (granularity, bucket), {'granularity': granularity, 'bucket': bucket}
+                )
+                for field, count in counts.items():
+                    doc[field] = doc.get(field, 0) + count
+
+    def get_rollups(self, granularity, start, end):
+        with self._lock:
+            docs = [dict(doc) for (kind, bucket), doc in self._rollups.items()
+                    if kind == granularity and start <= bucket < end]
+        return sorted(docs, key=lambda doc: doc['bucket'])
@@ -0,0 +1,105 @@
+"""
+Cold-start import cost of the serverless entry point
+
+Runs `python -X importtime -c "import index"` in fresh interpreters, takes
+the fastest of --runs, and reports the total plus the modules with the
+highest self time under it. Fails (exit 1) when the total exceeds
+--budget-ms or when a module listed in --forbid is imported, so CI can
+catch regressions:
+
+    python -m benchmarks.import_time --budget-ms 400 --output import-time.json
+"""
+import os
+import re
+import sys
+import json
+import argparse
+import subprocess
+
+# Imported by the routes that need them, never at import time
+DEFAULT_FORBIDDEN = ['pymongo', 'bson', 'bcrypt', 'razorpay', 'requests', 'dotenv']
+
+LINE = re.compile(r'^import time:\s+(\d+)\s*\|\s*(\d+)\s*\|(\s*)(\S+)')
+
+
+def measure(module, env):
+    """One run: [(name, self us, cumulative us)] for every module imported
+    while importing `module`, plus `module` itself last"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"],
+        cwd=root, env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    # importtime prints children before their parent; everything after the
+    # previous top-level line belongs to the next top-level module
+    pending = []
+    for line in result.stderr.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        pending.append((name, int(self_us), int(cumulative_us)))
+        if len(indent) == 1:
+            if name == module:
+                return pending
+            pending = []
+    raise RuntimeError(f"No importtime entry for {module}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import time of the app entry point")
+    parser.add_argument('--module', default='index')
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=15, help='modules with the highest self time to list')
+    parser.add_argument('--budget-ms', type=float, help='fail when the total exceeds this')
+    parser.add_argument('--forbid', nargs='*', default=DEFAULT_FORBIDDEN,
+                        help='modules that must not be imported (default: %(default)s)')
+    parser.add_argument('--output', help='write the result as JSON')
+    args = parser.parse_args()
+
+    # Measure the code, not whatever a local .env or platform happens to set
+    env = {key: value for key, value in os.environ.items() if key != 'MONGODB_URI'}
+
+    runs = [measure(args.module, env) for _ in range(args.runs)]
+    best = min(runs, key=lambda imports: imports[-1][2])
+    total_ms = best[-1][2] / 1000
+
+    slowest = sorted(best[:-1], key=lambda entry: entry[1], reverse=True)[:args.top]
+    forbidden_roots = sorted({name.split('.')[0] for name, _, _ in best
+                              if name.split('.')[0] in set(args.forbid)})
+
+    print(f"import {args.module}: {total_ms:.1f} ms (best of {args.runs})\n")
+    print(f"{'self ms':>9} {'cumul. ms':>10}  module")
+    for name, self_us, cumulative_us in slowest:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>10.1f}  {name}")
+    if forbidden_roots:
+        print(f"\nImported at startup but should be lazy: {', '.join(forbidden_roots)}")
+
+    result = {
+        'module': args.module,
+        'runs': args.runs,
+        'total_ms': round(total_ms, 2),
+        'modules_imported': len(best),
+        'slowest': [
+            {'module': name, 'self_ms': round(self_us / 1000, 2), 'cumulative_ms': round(cumulative_us / 1000, 2)}
+            for name, self_us, cumulative_us in slowest
+        ],
+        'forbidden_imported': forbidden_roots,
+        'budget_ms': args.budget_ms
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+
+    failed = bool(forbidden_roots)
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\nOver budget: {total_ms:.1f} ms > {args.budget_ms:.1f} ms")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
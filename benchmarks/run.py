@@ -0,0 +1,280 @@
+"""
+Load benchmark for the main user flows
+
+Starts the stub upstream and the app (in-memory FakeDatabase unless
+--mongo-uri is given), then runs --users virtual users, --concurrency at a
+time. Each user signs up, logs in, checks usage status, generates
+summaries, creates a Razorpay order and verifies the payment. Latency
+percentiles and throughput per endpoint are printed and saved as JSON;
+pass an earlier result as --baseline to see the change.
+
+    python -m benchmarks.run --users 200 --concurrency 20 --latency-ms 300
+    python -m benchmarks.run --baseline benchmarks/results/bench-20240101-120000.json
+"""
+import os
+import sys
+import hmac
+import json
+import math
+import time
+import uuid
+import socket
+import hashlib
+import argparse
+import subprocess
+from datetime import datetime
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from benchmarks.stub_upstream import add_arguments
+
+RAZORPAY_KEY_ID = 'rzp_test_benchmark'
+RAZORPAY_KEY_SECRET = 'benchmark-secret'
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+PROFILE = {
+    'current_job_title': 'Software Engineer',
+    'job_description': 'Building and operating web services',
+    'years_experience': '5',
+    'achievements': 'Cut API latency by 40 percent',
+    'technical_skills': 'Python, Flask, MongoDB',
+    'education': 'B.Tech in Computer Science'
+}
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode} before becoming ready")
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} did not become ready within {timeout}s")
+
+
+class Recorder:
+    def __init__(self):
+        self.samples = defaultdict(list)
+
+    def call(self, session, name, method, url, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = session.request(method, url, timeout=60, **kwargs)
+            status = response.status_code
+        except requests.RequestException:
+            response, status = None, 0
+        self.samples[name].append((time.perf_counter() - start, status))
+        return response
+
+
+class Flow:
+    def __init__(self, base_url, args):
+        self.base_url = base_url
+        self.args = args
+
+    def profile(self, user_index, n):
+        if self.args.profile_pool:
+            variant = (user_index * self.args.generations + n) % self.args.profile_pool
+        else:
+            variant = f"{user_index}-{n}-{uuid.uuid4().hex[:6]}"
+        return dict(PROFILE, achievements=f"{PROFILE['achievements']} (variant {variant})")
+
+    def run_user(self, user_index):
+        recorder = Recorder()
+        url = self.base_url
+        email = f"bench-{uuid.uuid4().hex[:12]}@example.com"
+        password = 'benchmark-password'
+
+        with requests.Session() as session:
+            recorder.call(session, 'signup', 'POST', f"{url}/api/auth/signup",
+                          json={'name': 'Bench User', 'email': email, 'password': password})
+
+        with requests.Session() as session:
+            response = recorder.call(session, 'login', 'POST', f"{url}/api/auth/login",
+                                     json={'email': email, 'password': password})
+            if response is None or response.status_code != 200:
+                return recorder
+
+            for _ in range(self.args.status_checks):
+                recorder.call(session, 'usage_status', 'GET', f"{url}/api/usage-status")
+
+            for n in range(self.args.generations):
+                recorder.call(session, 'generate_summary', 'POST', f"{url}/api/generate-summary",
+                              json=self.profile(user_index, n))
+
+            if self.args.payments:
+                response = recorder.call(session, 'create_order', 'POST',
+                                         f"{url}/api/create-razorpay-order", json={})
+                if response is not None and response.status_code == 200:
+                    order_id = response.json()['order_id']
+                    payment_id = f"pay_bench{uuid.uuid4().hex[:10]}"
+                    signature = hmac.new(
+                        RAZORPAY_KEY_SECRET.encode('utf-8'),
+                        f"{order_id}|{payment_id}".encode('utf-8'),
+                        hashlib.sha256
+                    ).hexdigest()
+                    recorder.call(session, 'verify_payment', 'POST',
+                                  f"{url}/api/verify-razorpay-payment", json={
+                                      'razorpay_order_id': order_id,
+                                      'razorpay_payment_id': payment_id,
+                                      'razorpay_signature': signature
+                                  })
+        return recorder
+
+
+def summarize(samples, elapsed):
+    endpoints = {}
+    for name, entries in samples.items():
+        latencies = sorted(latency for latency, _ in entries)
+        statuses = defaultdict(int)
+        for _, status in entries:
+            statuses[str(status)] += 1
+        endpoints[name] = {
+            'count': len(entries),
+            'errors': sum(1 for _, status in entries if status == 0 or status >= 400),
+            'statuses': dict(statuses),
+            'rps': round(len(entries) / elapsed, 2) if elapsed else None,
+            'mean_ms': round(sum(latencies) / len(latencies) * 1000, 2),
+            'p50_ms': round(percentile(latencies, 50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 2)
+        }
+    return endpoints
+
+
+def print_report(endpoints, baseline=None):
+    header = f"{'endpoint':<18}{'count':>7}{'errors':>8}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+    print(header)
+    print('-' * len(header))
+    for name, row in endpoints.items():
+        line = (f"{name:<18}{row['count']:>7}{row['errors']:>8}{row['rps']:>9}"
+                f"{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}")
+        previous = (baseline or {}).get(name)
+        if previous and previous.get('p95_ms'):
+            change = (row['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100
+            line += f"   p95 {change:+.1f}% vs baseline"
+        print(line)
+
+
+def start_processes(args):
+    """Launch the stub upstream and the app; returns (base_url, processes)"""
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+
+    stub_cmd = [sys.executable, '-m', 'benchmarks.stub_upstream', '--port', str(stub_port),
+                '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+                '--error-rate', str(args.error_rate), '--timeout-rate', str(args.timeout_rate),
+                '--timeout-ms', str(args.timeout_ms), '--bad-shape-rate', str(args.bad_shape_rate),
+                '--shape', args.shape]
+    app_cmd = [sys.executable, '-m', 'benchmarks.serve', '--port', str(app_port)]
+    if args.mongo_uri:
+        app_cmd += ['--mongo-uri', args.mongo_uri]
+
+    env = dict(os.environ)
+    env.update({
+        'RESUME_API_URL': f"{stub_url}/summaries",
+        'RAZORPAY_KEY_ID': RAZORPAY_KEY_ID,
+        'RAZORPAY_KEY_SECRET': RAZORPAY_KEY_SECRET,
+        'RAZORPAY_BASE_URL': f"{stub_url}/v1"
+    })
+    env.setdefault('FREE_TRIAL_LIMIT', str(max(args.generations, 1)))
+    env.setdefault('LOG_LEVEL', 'WARNING')
+    if not args.mongo_uri:
+        # FakeDatabase keeps no jobs collection
+        env['JOB_QUEUE_BACKEND'] = 'local'
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    log = open(args.server_log, 'a') if args.server_log else subprocess.DEVNULL
+    processes = [subprocess.Popen(stub_cmd, cwd=root, env=env, stdout=log, stderr=log)]
+    wait_until_ready(stub_url, processes[0])
+    processes.append(subprocess.Popen(app_cmd, cwd=root, env=env, stdout=log, stderr=log))
+    base_url = f"http://127.0.0.1:{app_port}"
+    wait_until_ready(f"{base_url}/health", processes[1])
+    return base_url, processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the main user flows")
+    parser.add_argument('--users', type=int, default=100, help='virtual users to run')
+    parser.add_argument('--concurrency', type=int, default=10, help='users running at once')
+    parser.add_argument('--status-checks', type=int, default=5, help='usage-status calls per user')
+    parser.add_argument('--generations', type=int, default=3, help='generate-summary calls per user')
+    parser.add_argument('--no-payments', dest='payments', action='store_false',
+                        help='skip the Razorpay order and verification calls')
+    parser.add_argument('--profile-pool', type=int, default=0,
+                        help='distinct profiles to draw from (0 = every generation is unique)')
+    parser.add_argument('--mongo-uri', help='benchmark against this MongoDB instead of the in-memory fake')
+    parser.add_argument('--app-url', help='benchmark an already running app instead of starting one')
+    parser.add_argument('--server-log', help='append app and stub output to this file (default: discard)')
+    parser.add_argument('--output', help='result file (default benchmarks/results/bench-<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier result file to compare p95 against')
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    processes = []
+    try:
+        if args.app_url:
+            base_url = args.app_url.rstrip('/')
+        else:
+            base_url, processes = start_processes(args)
+
+        flow = Flow(base_url, args)
+        samples = defaultdict(list)
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            for recorder in executor.map(flow.run_user, range(args.users)):
+                for name, entries in recorder.samples.items():
+                    samples[name].extend(entries)
+        elapsed = time.perf_counter() - start
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait(timeout=10)
+
+    endpoints = summarize(samples, elapsed)
+    total = sum(row['count'] for row in endpoints.values())
+    result = {
+        'started_at': started_at.isoformat(),
+        'elapsed_seconds': round(elapsed, 3),
+        'total_requests': total,
+        'total_rps': round(total / elapsed, 2) if elapsed else None,
+        'config': vars(args),
+        'endpoints': endpoints
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f).get('endpoints')
+
+    print(f"{total} requests in {elapsed:.1f}s ({result['total_rps']} req/s)\n")
+    print_report(endpoints, baseline)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench-{started_at:%Y%m%d-%H%M%S}.json")
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Run the Flask app for benchmarking
+
+With --mongo-uri the real Database is used against that server (e.g. a
+local mongod); otherwise FakeDatabase keeps everything in memory, which
+requires a single process. Point RESUME_API_URL at the stub upstream and
+set RAZORPAY_BASE_URL to route Razorpay order creation to it as well.
+
+    python -m benchmarks.serve --port 8700 [--mongo-uri mongodb://localhost:27017]
+"""
+import os
+import logging
+import argparse
+from werkzeug.serving import make_server
+
+
+def load_app(mongo_uri=None):
+    if mongo_uri:
+        os.environ['MONGODB_URI'] = mongo_uri
+    else:
+        import database
+        from benchmarks.fake_database import FakeDatabase
+        database.db = FakeDatabase()
+
+    import app as app_module
+
+    razorpay_base_url = os.getenv('RAZORPAY_BASE_URL')
+    razorpay_client = app_module.get_razorpay_client()
+    if razorpay_base_url and razorpay_client is not None:
+        razorpay_client.base_url = razorpay_base_url
+    return app_module.app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve the app for benchmarks")
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--mongo-uri')
+    args = parser.parse_args()
+
+    app = load_app(args.mongo_uri)
+    # Per-request access lines would dominate the output under load
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', args.port, app, threaded=True)
+    print(f"Benchmark app listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,126 @@
+"""
+Local stand-in for the summary API and the Razorpay orders API
+
+POST /summaries answers like RESUME_API_URL after a configurable delay,
+with configurable error rates and response shapes; POST .../orders answers
+like Razorpay's order creation. Run standalone with:
+
+    python -m benchmarks.stub_upstream --port 8701 --latency-ms 300 --error-rate 0.05
+"""
+import json
+import time
+import random
+import argparse
+import itertools
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Response shapes generate_custom_api_summaries understands, plus one it
+# does not ('bad')
+SHAPES = {
+    'summaries': lambda texts: {'summaries': texts},
+    'data-dict': lambda texts: {'data': {'v1': texts[0], 'v2': texts[1], 'v3': texts[2]}},
+    'data-list': lambda texts: {'data': texts},
+    'list': lambda texts: texts,
+    'bad': lambda texts: {'unexpected': True}
+}
+
+
+class StubConfig:
+    def __init__(self, latency_ms=200, jitter_ms=50, error_rate=0.0, timeout_rate=0.0,
+                 timeout_ms=35000, bad_shape_rate=0.0, shape='summaries'):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.timeout_rate = timeout_rate
+        self.timeout_ms = timeout_ms
+        self.bad_shape_rate = bad_shape_rate
+        self.shape = shape
+
+
+def make_handler(config):
+    order_ids = itertools.count(1)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass
+
+        def _reply(self, status, payload):
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            return json.loads(self.rfile.read(length) or b'{}')
+
+        def do_POST(self):
+            payload = self._read_json()
+            if self.path.rstrip('/').endswith('/orders'):
+                self._reply(200, {
+                    'id': f"order_bench{next(order_ids):010d}",
+                    'entity': 'order',
+                    'amount': payload.get('amount'),
+                    'currency': payload.get('currency', 'INR'),
+                    'receipt': payload.get('receipt'),
+                    'status': 'created'
+                })
+                return
+
+            roll = random.random()
+            if roll < config.timeout_rate:
+                time.sleep(config.timeout_ms / 1000)
+            else:
+                delay = config.latency_ms + random.uniform(-config.jitter_ms, config.jitter_ms)
+                time.sleep(max(0, delay) / 1000)
+
+            roll = random.random()
+            if roll < config.error_rate:
+                self._reply(500, {'message': 'Internal server error'})
+                return
+            shape = 'bad' if roll < config.error_rate + config.bad_shape_rate else config.shape
+            title = payload.get('current_job_title', 'Professional')
+            texts = [f"Benchmark summary {n} for {title}." for n in (1, 2, 3)]
+            self._reply(200, SHAPES[shape](texts))
+
+    return Handler
+
+
+def make_server(port, config):
+    return ThreadingHTTPServer(('127.0.0.1', port), make_handler(config))
+
+
+def add_arguments(parser):
+    parser.add_argument('--latency-ms', type=float, default=200)
+    parser.add_argument('--jitter-ms', type=float, default=50)
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of HTTP 500 replies')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='fraction of replies delayed by --timeout-ms')
+    parser.add_argument('--timeout-ms', type=float, default=35000)
+    parser.add_argument('--bad-shape-rate', type=float, default=0.0, help='fraction of unparseable 200 replies')
+    parser.add_argument('--shape', choices=sorted(SHAPES), default='summaries')
+
+
+def config_from_args(args):
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        timeout_ms=args.timeout_ms,
+        bad_shape_rate=args.bad_shape_rate,
+        shape=args.shape
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8701)
+    add_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args.port, config_from_args(args))
+    print(f"Stub upstream listening on http://127.0.0.1:{args.port}")
+    server.serve_forever()
@@ -0,0 +1,122 @@
+"""
+Circuit breaker for the resume summary upstream
+
+Tracks the outcome and latency of recent upstream calls in a rolling time
+window. When the failure rate (slow calls count as failures) crosses the
+threshold the breaker opens and callers fail fast, so requests go straight
+to template summaries instead of tying up a worker for the full timeout.
+After a cooldown one trial call is let through (half-open); its outcome
+closes the breaker again or re-opens it.
+"""
+import os
+import time
+import threading
+import logging
+from collections import deque
+from upstream import UpstreamError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(UpstreamError):
+    """Raised instead of calling the upstream while the breaker is open"""
+
+
+class CircuitBreaker:
+    def __init__(self, failure_rate=None, slow_call_seconds=None, min_calls=None,
+                 window_seconds=None, cooldown_seconds=None):
+        self.failure_rate = failure_rate or float(os.getenv('BREAKER_FAILURE_RATE', 0.5))
+        self.slow_call_seconds = slow_call_seconds or float(os.getenv('BREAKER_SLOW_CALL_SECONDS', 10))
+        self.min_calls = min_calls or int(os.getenv('BREAKER_MIN_CALLS', 5))
+        self.window_seconds = window_seconds or float(os.getenv('BREAKER_WINDOW_SECONDS', 60))
+        self.cooldown_seconds = cooldown_seconds or float(os.getenv('BREAKER_COOLDOWN_SECONDS', 30))
+        self.state = CLOSED
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._calls = deque()
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    def _prune(self, now):
+        while self._calls and self._calls[0][0] < now - self.window_seconds:
+            self._calls.popleft()
+
+    def _open(self, now):
+        if self.state != OPEN:
+            logger.warning(f"Upstream circuit breaker opened (was {self.state})")
+        self.state = OPEN
+        self._opened_at = now
+        self._trial_in_flight = False
+
+    def allow_request(self):
+        """True if a call may go to the upstream right now"""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+
+            now = time.monotonic()
+            if self.state == OPEN and now - self._opened_at >= self.cooldown_seconds:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, success, latency):
+        """Record the outcome of a call let through by allow_request"""
+        failed = not success or latency >= self.slow_call_seconds
+        now = time.monotonic()
+
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    logger.info("Upstream circuit breaker closed after successful trial call")
+                    self.state = CLOSED
+                    self._trial_in_flight = False
+                    self._calls.clear()
+                return
+
+            self._calls.append((now, failed, latency))
+            self._prune(now)
+            if self.state == CLOSED and len(self._calls) >= self.min_calls:
+                failures = sum(1 for call in self._calls if call[1])
+                if failures / len(self._calls) >= self.failure_rate:
+                    self._open(now)
+
+    def call(self, fn):
+        """Run fn() through the breaker, raising CircuitOpenError when open"""
+        if not self.allow_request():
+            raise CircuitOpenError("Upstream circuit breaker is open")
+
+        start = time.monotonic()
+        try:
+            result = fn()
+        except Exception:
+            self.record(False, time.monotonic() - start)
+            raise
+        self.record(True, time.monotonic() - start)
+        return result
+
+    def stats(self):
+        with self._lock:
+            now = time.monotonic()
+            self._prune(now)
+            calls = len(self._calls)
+            failures = sum(1 for call in self._calls if call[1])
+            return {
+                'state': self.state,
+                'window_calls': calls,
+                'window_failure_rate': round(failures / calls, 4) if calls else 0.0,
+                'rejected': self.rejected,
+                'open_for_seconds': round(now - self._opened_at, 1) if self.state == OPEN else 0
+            }
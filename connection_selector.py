@@ -0,0 +1,132 @@
+"""
+Race MongoDB connection strategies
+
+Render deployments try several connection variants (URI tweaks, relaxed
+TLS, direct hosts). Trying them one after another makes every failing
+variant cost its full timeout on each boot. ConnectionSelector starts the
+candidates concurrently, keeps the first client that answers ping and
+closes the others, so startup takes as long as the fastest working
+strategy.
+
+The winner is remembered in a small JSON file (MONGO_STRATEGY_CACHE,
+default in the temp directory), keyed by a hash of the candidate URIs. On
+the next boot that strategy gets a MONGO_STRATEGY_HEAD_START second head
+start before the rest are launched, so a healthy deployment opens a single
+client.
+"""
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from pymongo import MongoClient
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_PATH = os.path.join(tempfile.gettempdir(), 'resume_mongo_strategy.json')
+
+
+def _close_if_connected(future):
+    if not future.cancelled() and future.exception() is None:
+        future.result().close()
+
+
+class ConnectionSelector:
+    def __init__(self, strategies, cache_path=None, head_start=None, client_factory=MongoClient):
+        # strategies: [(name, uri, MongoClient keyword options)]
+        self.strategies = list(strategies)
+        self.cache_path = cache_path or os.getenv('MONGO_STRATEGY_CACHE', DEFAULT_CACHE_PATH)
+        self.head_start = head_start if head_start is not None else float(os.getenv('MONGO_STRATEGY_HEAD_START', 3))
+        self.client_factory = client_factory
+
+    @property
+    def cache_key(self):
+        uris = '|'.join(uri for _, uri, _ in self.strategies)
+        return hashlib.sha256(uris.encode('utf-8')).hexdigest()[:16]
+
+    def load_winner(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f).get(self.cache_key)
+        except (OSError, ValueError):
+            return None
+
+    def save_winner(self, name):
+        try:
+            try:
+                with open(self.cache_path) as f:
+                    winners = json.load(f)
+            except (OSError, ValueError):
+                winners = {}
+            winners[self.cache_key] = name
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(winners, f)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning(f"Could not save MongoDB strategy cache: {e}")
+
+    def _attempt(self, strategy):
+        name, uri, options = strategy
+        client = self.client_factory(uri, **options)
+        try:
+            client.admin.command('ping')
+        except Exception:
+            client.close()
+            raise
+        return client
+
+    def select(self):
+        """Return (strategy name, connected client); raises ConnectionError
+        when every strategy fails"""
+        if not self.strategies:
+            raise ConnectionError("No MongoDB connection strategies to try")
+
+        cached = self.load_winner()
+        ordered = sorted(self.strategies, key=lambda strategy: strategy[0] != cached)
+        waiting = ordered[1:] if ordered[0][0] == cached else []
+        to_start = ordered[:1] if waiting else ordered
+
+        started = time.monotonic()
+        executor = ThreadPoolExecutor(max_workers=len(ordered), thread_name_prefix='mongo-strategy')
+        running = {}
+        errors = {}
+        winner = None
+        try:
+            while winner is None:
+                for strategy in to_start:
+                    logger.info(f"Trying MongoDB connection strategy '{strategy[0]}'")
+                    running[executor.submit(self._attempt, strategy)] = strategy[0]
+                to_start = []
+                if not running:
+                    break
+
+                done, _ = wait(running, timeout=self.head_start if waiting else None,
+                               return_when=FIRST_COMPLETED)
+                if not done or any(future.exception() is not None for future in done):
+                    # The cached strategy is slow or failed: race the rest
+                    to_start, waiting = waiting, []
+                for future in done:
+                    name = running.pop(future)
+                    if future.exception() is not None:
+                        errors[name] = future.exception()
+                        logger.warning(f"MongoDB strategy '{name}' failed: {future.exception()}")
+                    elif winner is None:
+                        winner = (name, future.result())
+                    else:
+                        future.result().close()
+        finally:
+            for future in running:
+                future.add_done_callback(_close_if_connected)
+            executor.shutdown(wait=False)
+
+        if winner is None:
+            raise ConnectionError(f"All MongoDB connection strategies failed: {errors}")
+
+        name, client = winner
+        logger.info(f"Connected with MongoDB strategy '{name}' in {time.monotonic() - started:.1f}s")
+        if name != cached:
+            self.save_winner(name)
+        return winner
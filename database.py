@@ -1,23 +1,175 @@
 import os
+import time
+import threading
 import logging
-from pymongo import MongoClient
+import pymongo
+from pymongo import MongoClient, ReturnDocument, UpdateOne
+from pymongo.errors import DuplicateKeyError, BulkWriteError
 from datetime import datetime, timedelta
 import hashlib
 import uuid
-import bcrypt
+from user_cache import UserCache
+from user_views import AuthView, QuotaView, ProfileView
+from generation_logger import GenerationLogger
+from index_manager import IndexManager
+from stats_engine import StatsEngine
+from password_hasher import PasswordHasher, HasherBusy
+from activity_tracker import LastActiveTracker
+from structured_logging import log_event
+from mongo_metrics import MongoCommandMetrics
+from connection_selector import ConnectionSelector
+from rollups import RollupRecorder, GRANULARITIES, ROLLUP_FIELDS, SOURCE_FIELDS, bucket_id
 
-# Configure logging
+# Configure logging (a no-op once app.py has called configure_logging)
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def mongo_pool_options():
+    """Connection pool settings sized for the worker's request threads.
+
+    gunicorn.conf.py exports MONGO_POOL_THREADS (threads or greenlets per
+    worker). The pool gets one connection per thread plus
+    MONGO_POOL_BACKGROUND for the flusher, job and index threads, capped at
+    MONGO_MAX_POOL_SIZE; a quarter is kept warm so a burst after idling does
+    not open every connection at once. Without MONGO_POOL_THREADS pymongo's
+    defaults apply.
+    """
+    threads = int(os.getenv('MONGO_POOL_THREADS', 0))
+    if threads <= 0:
+        return {}
+    max_pool = min(threads + int(os.getenv('MONGO_POOL_BACKGROUND', 4)), int(os.getenv('MONGO_MAX_POOL_SIZE', 100)))
+    return {
+        'maxPoolSize': max_pool,
+        'minPoolSize': min(max_pool, max(1, threads // 4)),
+        'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', 300000))
+    }
+
+class DatabaseUnavailable(Exception):
+    """MongoDB could not answer; unlike a refusal, retrying may succeed"""
+
+
 class Database:
-    def __init__(self):
+    def __init__(self, build_indexes=True, background=False, connect=True):
         # MongoDB Atlas connection string from environment
         self.mongo_uri = os.getenv('MONGODB_URI')
         self.client = None
         self.db = None
         self.is_render = os.getenv('RENDER') is not None  # Detect Render environment
+        self.user_cache = UserCache()
+        self.generation_logger = GenerationLogger(self.write_generations)
+        self.index_manager = IndexManager(self)
+        self.stats_engine = StatsEngine(self)
+        self.rollups = RollupRecorder(self.write_rollups)
+        self.password_hasher = PasswordHasher()
+        self.activity_tracker = LastActiveTracker(self.write_last_active)
+        # Passed to every MongoClient built below; feeds /metrics
+        self.command_metrics = MongoCommandMetrics()
+        self.connection_strategy = None
+        self.build_indexes = build_indexes
+        # Set once a connection has answered ping; requests check it to
+        # fail fast instead of waiting on a connection that is still coming up
+        self.ready = threading.Event()
+        self.connect_attempts = 0
+        self.connect_seconds = None
+        self._ping_lock = threading.Lock()
+        self._last_ping = (False, float('-inf'))
+        # connect=False leaves connecting to after_fork() in each gunicorn worker
+        if connect and background:
+            self.connect_in_background()
+        elif connect:
+            self._connect_and_prepare()
+    
+    def flush_per_request(self):
+        """Write out buffers configured with a 0 flush interval; called at
+        the end of every request"""
+        for buffer in (self.generation_logger, self.rollups, self.activity_tracker):
+            if buffer.flush_per_request:
+                buffer.flush()
+    
+    @property
+    def is_ready(self):
+        return self.ready.is_set()
+    
+    def _connect_and_prepare(self):
+        """Connect once; on success mark ready and start index builds"""
+        started = time.monotonic()
+        self.connect_attempts += 1
         self.connect()
+        if self.db is None:
+            return False
+        self.connect_seconds = round(time.monotonic() - started, 3)
+        self._last_ping = (True, time.monotonic())
+        self.ready.set()
+        if self.build_indexes:
+            self.index_manager.build_in_background()
+        return True
+    
+    def connect_in_background(self, retry_interval=None, max_retry_interval=None):
+        """Connect on a daemon thread so importing the app never blocks on
+        MongoDB; failed attempts are retried after DB_CONNECT_RETRY_SECONDS,
+        doubling up to DB_CONNECT_RETRY_MAX_SECONDS"""
+        retry_interval = retry_interval or float(os.getenv('DB_CONNECT_RETRY_SECONDS', 30))
+        max_retry_interval = max_retry_interval or float(os.getenv('DB_CONNECT_RETRY_MAX_SECONDS', 300))
+        
+        def run():
+            delay = retry_interval
+            while not self._connect_and_prepare():
+                if not self.mongo_uri:
+                    return
+                logger.warning(f"MongoDB not reachable, retrying in {delay:.0f}s")
+                time.sleep(delay)
+                delay = min(delay * 2, max(retry_interval, max_retry_interval))
+            logger.info(f"MongoDB ready after {self.connect_seconds}s ({self.connect_attempts} attempt(s))")
+        
+        threading.Thread(target=run, name='mongo-connect', daemon=True).start()
+    
+    def after_fork(self):
+        """Start a fresh connection in a forked worker.
+
+        pymongo clients must not be used across fork(); a client inherited
+        from a preloading parent is dropped (not closed, its sockets belong
+        to the parent) and the child connects on its own thread.
+        """
+        self.client = None
+        self.db = None
+        self.ready = threading.Event()
+        self._ping_lock = threading.Lock()
+        self._last_ping = (False, float('-inf'))
+        self.connect_attempts = 0
+        self.connect_in_background()
+    
+    def ping(self, max_age=None):
+        """Whether MongoDB answered ping within the last max_age seconds
+        (READINESS_PING_TTL). At most one probe runs at a time; concurrent
+        callers get the previous result instead of queueing behind it."""
+        max_age = max_age if max_age is not None else float(os.getenv('READINESS_PING_TTL', 5))
+        ok, checked_at = self._last_ping
+        if not self.is_ready:
+            return False
+        if time.monotonic() - checked_at < max_age or not self._ping_lock.acquire(blocking=False):
+            return ok
+        
+        try:
+            with pymongo.timeout(float(os.getenv('READINESS_PING_TIMEOUT', 2))):
+                self.client.admin.command('ping')
+            ok = True
+        except Exception as e:
+            logger.warning(f"MongoDB readiness ping failed: {e}")
+            ok = False
+        finally:
+            self._last_ping = (ok, time.monotonic())
+            self._ping_lock.release()
+        return ok
+    
+    def readiness(self):
+        ok = self.ping()
+        return {
+            'connected': self.is_ready,
+            'ping_ok': ok,
+            'connect_attempts': self.connect_attempts,
+            'connect_seconds': self.connect_seconds,
+            'strategy': self.connection_strategy
+        }
     
     def connect(self):
         """Connect to MongoDB Atlas"""
@@ -29,13 +181,7 @@ class Database:
             # Different connection strategies based on environment
             if self.is_render:
                 logger.info("Detected Render environment, using SSL bypass")
-                try:
-                    self._connect_render()
-                except Exception as e:
-                    logger.error(f"Render connection failed: {e}")
-                    # Try one more fallback approach for Render
-                    logger.info("Attempting final fallback connection for Render")
-                    self._connect_render_fallback()
+                self._connect_render()
             else:
                 logger.info("Local/other environment, using standard connection")
                 self._connect_standard()
@@ -47,152 +193,94 @@ class Database:
     
     def _connect_standard(self):
         """Standard MongoDB connection for local/other environments"""
-        self.client = MongoClient(self.mongo_uri)
-        self.db = self.client.resume_generator
-        self.client.admin.command('ping')
+        client = MongoClient(self.mongo_uri, event_listeners=[self.command_metrics], **mongo_pool_options())
+        try:
+            client.admin.command('ping')
+        except Exception:
+            # Retries build a new client; close this one and its monitor threads
+            client.close()
+            raise
+        self.client = client
+        self.db = client.resume_generator
+        self.connection_strategy = 'standard'
         logger.info("Successfully connected to MongoDB Atlas (standard)")
     
-    def _connect_render(self):
-        """Special MongoDB connection for Render environment"""
+    def _render_strategies(self):
+        """Candidate (name, uri, options) connections for Render"""
         import ssl
         import urllib.parse
         
-        # For Render, try different URI modifications
         base_uri = self.mongo_uri
+        listeners = [self.command_metrics]
+        pool = mongo_pool_options()
+        strategies = []
         
-        # Strategy 1: Modify URI to disable SSL
-        try:
-            logger.info("Render: Trying connection strategy 1 - URI modification")
-            
-            # Parse the URI and modify SSL parameters
-            if "?" in base_uri:
-                uri_part, params = base_uri.split("?", 1)
-                # Remove existing SSL params and add our own
-                param_dict = urllib.parse.parse_qs(params)
-                # Clear SSL-related params
-                for key in list(param_dict.keys()):
-                    if 'ssl' in key.lower() or 'tls' in key.lower():
-                        del param_dict[key]
-                
-                # Add SSL bypass parameters
-                param_dict['ssl'] = ['false']
-                param_dict['authSource'] = ['admin']
-                
-                new_params = urllib.parse.urlencode(param_dict, doseq=True)
-                modified_uri = f"{uri_part}?{new_params}"
-            else:
-                modified_uri = f"{base_uri}?ssl=false&authSource=admin"
-            
-            logger.info(f"Modified URI: {modified_uri[:50]}...")
-            self.client = MongoClient(
-                modified_uri,
-                serverSelectionTimeoutMS=15000,
-                connectTimeoutMS=15000,
-                socketTimeoutMS=15000
-            )
-            self.db = self.client.resume_generator
-            self.client.admin.command('ping')
-            logger.info("Successfully connected to MongoDB Atlas using URI modification")
-            return
-        except Exception as e:
-            logger.warning(f"URI modification strategy failed: {str(e)}")
-            if self.client:
-                self.client.close()
-                self.client = None
-                self.db = None
-
-        # Strategy 2: Try with minimal SSL context
-        try:
-            logger.info("Render: Trying connection strategy 2 - minimal SSL")
-            
-            import ssl
-            ssl_context = ssl.create_default_context()
-            ssl_context.check_hostname = False
-            ssl_context.verify_mode = ssl.CERT_NONE
-            
-            self.client = MongoClient(
-                base_uri,
-                ssl_context=ssl_context,
-                serverSelectionTimeoutMS=10000,
-                connectTimeoutMS=10000,
-                socketTimeoutMS=10000
-            )
-            self.db = self.client.resume_generator
-            self.client.admin.command('ping')
-            logger.info("Successfully connected to MongoDB Atlas using minimal SSL")
-            return
-        except Exception as e:
-            logger.warning(f"Minimal SSL strategy failed: {str(e)}")
-            if self.client:
-                self.client.close()
-                self.client = None
-                self.db = None
-
-        # Strategy 3: Try standard connection (sometimes works on retry)
-        try:
-            logger.info("Render: Trying connection strategy 3 - standard retry")
-            self.client = MongoClient(
-                base_uri,
-                serverSelectionTimeoutMS=30000,
-                connectTimeoutMS=30000,
-                socketTimeoutMS=30000,
-                retryWrites=True,
-                maxPoolSize=1
-            )
-            self.db = self.client.resume_generator
-            self.client.admin.command('ping')
-            logger.info("Successfully connected to MongoDB Atlas using standard retry")
-            return
-        except Exception as e:
-            logger.warning(f"Standard retry strategy failed: {str(e)}")
-            if self.client:
-                self.client.close()
-                self.client = None
-                self.db = None
-
-        # If all strategies fail
-        raise Exception("All Render connection strategies failed")
-    
-    def _connect_render_fallback(self):
-        """Absolute last resort connection for Render"""
-        try:
-            logger.info("Render fallback: Attempting connection with all SSL disabled")
-            
-            # Extract connection details from URI for manual connection
-            import re
-            
-            # Parse mongodb+srv URI manually
-            match = re.match(r'mongodb\+srv://([^:]+):([^@]+)@([^/]+)/([^?]+)', self.mongo_uri)
-            if not match:
-                raise Exception("Could not parse MongoDB URI")
-            
+        # URI modification: drop SSL/TLS params and disable SSL
+        if "?" in base_uri:
+            uri_part, params = base_uri.split("?", 1)
+            param_dict = urllib.parse.parse_qs(params)
+            for key in list(param_dict.keys()):
+                if 'ssl' in key.lower() or 'tls' in key.lower():
+                    del param_dict[key]
+            param_dict['ssl'] = ['false']
+            param_dict['authSource'] = ['admin']
+            modified_uri = f"{uri_part}?{urllib.parse.urlencode(param_dict, doseq=True)}"
+        else:
+            modified_uri = f"{base_uri}?ssl=false&authSource=admin"
+        strategies.append(('uri_modification', modified_uri, {
+            'serverSelectionTimeoutMS': 15000,
+            'connectTimeoutMS': 15000,
+            'socketTimeoutMS': 15000,
+            'event_listeners': listeners,
+            **pool
+        }))
+        
+        # Minimal SSL context without certificate or hostname checks
+        ssl_context = ssl.create_default_context()
+        ssl_context.check_hostname = False
+        ssl_context.verify_mode = ssl.CERT_NONE
+        strategies.append(('minimal_ssl', base_uri, {
+            'ssl_context': ssl_context,
+            'serverSelectionTimeoutMS': 10000,
+            'connectTimeoutMS': 10000,
+            'socketTimeoutMS': 10000,
+            'event_listeners': listeners,
+            **pool
+        }))
+        
+        # Standard connection (sometimes works where the others do not)
+        strategies.append(('standard_retry', base_uri, {
+            'serverSelectionTimeoutMS': 30000,
+            'connectTimeoutMS': 30000,
+            'socketTimeoutMS': 30000,
+            'retryWrites': True,
+            'event_listeners': listeners,
+            **pool
+        }))
+        
+        # Last resort: direct host without SRV and SSL
+        import re
+        match = re.match(r'mongodb\+srv://([^:]+):([^@]+)@([^/]+)/([^?]+)', base_uri)
+        if match:
             username, password, host, database = match.groups()
-            
-            # URL decode password
-            import urllib.parse
             password = urllib.parse.unquote(password)
-            
-            # Create a simple connection without srv
             fallback_uri = f"mongodb://{username}:{urllib.parse.quote(password)}@{host}:27017/{database}?authSource=admin&ssl=false"
-            
-            logger.info("Trying fallback connection without SRV and SSL")
-            self.client = MongoClient(
-                fallback_uri,
-                serverSelectionTimeoutMS=20000,
-                connectTimeoutMS=20000,
-                socketTimeoutMS=20000
-            )
-            self.db = self.client.resume_generator
-            self.client.admin.command('ping')
-            logger.info("Successfully connected using fallback method")
-            
-        except Exception as e:
-            logger.error(f"Fallback connection failed: {e}")
-            # Create a mock database for development/testing
-            logger.warning("Creating mock database connection for Render")
-            self.client = None
-            self.db = None
-            raise Exception("All connection methods failed")
+            strategies.append(('no_srv_fallback', fallback_uri, {
+                'serverSelectionTimeoutMS': 20000,
+                'connectTimeoutMS': 20000,
+                'socketTimeoutMS': 20000,
+                'event_listeners': listeners,
+                **pool
+            }))
+        
+        return strategies
+    
+    def _connect_render(self):
+        """Special MongoDB connection for Render environment: race every
+        candidate strategy and keep the first that answers ping"""
+        selector = ConnectionSelector(self._render_strategies(), client_factory=MongoClient)
+        self.connection_strategy, self.client = selector.select()
+        self.db = self.client.resume_generator
     
     def create_user_account(self, name, email, password):
         """Create a new user account with authentication"""
@@ -202,13 +290,13 @@ class Database:
         
         try:
             # Check if user already exists
-            existing_user = self.db.users.find_one({"email": email})
+            existing_user = self.db.users.find_one({"email": email}, {'_id': True})
             if existing_user:
-                logger.info(f"User already exists: {email}")
+                log_event(logger, 'signup_duplicate')
                 return {"error": "An account with this email already exists."}
             
-            # Hash password
-            password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+            # Hash password on the bounded bcrypt pool
+            password_hash = self.password_hasher.hash(password)
             
             # Create user document
             user_id = str(uuid.uuid4())
@@ -226,76 +314,101 @@ class Database:
             # Insert user
             result = self.db.users.insert_one(user_doc)
             if result.inserted_id:
-                logger.info(f"User created successfully: {email}")
-                # Return user without password hash
-                del user_doc['password_hash']
-                return user_doc
+                self.increment_stats_counters({'total_users': 1})
+                self.rollups.record('signups')
+                log_event(logger, 'user_created', user_id=user_id)
+                # Profile view leaves out the password hash
+                return ProfileView.from_document(user_doc)
             else:
-                logger.error(f"Failed to insert user: {email}")
+                logger.error("Failed to insert user")
                 return {"error": "Failed to create account. Please try again."}
             
+        except DuplicateKeyError:
+            # Lost a race with a concurrent signup for the same email
+            log_event(logger, 'signup_duplicate')
+            return {"error": "An account with this email already exists."}
+        except HasherBusy:
+            logger.warning("Password hashing pool saturated during signup")
+            return {"error": "Server is busy, please try again shortly.", "busy": True}
         except Exception as e:
             logger.error(f"Error creating user account: {e}")
             return {"error": f"Database error: {str(e)}"}
     
     def authenticate_user(self, email, password):
-        """Authenticate user with email and password"""
+        """Authenticate user with email and password; returns an AuthView
+        without the password hash, or an error dict"""
         if self.db is None:
             logger.error("Database connection not available")
             return {"error": "Database connection failed. Please try again later."}
         
         try:
-            user = self.db.users.find_one({"email": email})
+            user = AuthView.from_document(
+                self.db.users.find_one({"email": email}, AuthView.PROJECTION)
+            )
             if not user:
-                logger.info(f"User not found: {email}")
+                log_event(logger, 'login_unknown_email')
                 return {"error": "Invalid email or password."}
             
             # Check password
-            if bcrypt.checkpw(password.encode('utf-8'), user['password_hash']):
-                # Update last active
-                self.db.users.update_one(
-                    {'email': email},
-                    {'$set': {'last_active': datetime.utcnow()}}
-                )
-                # Remove password hash from returned data
-                del user['password_hash']
-                logger.info(f"User authenticated successfully: {email}")
-                return user
+            if self.password_hasher.verify(password, user.password_hash):
+                # Update last active (coalesced, written in the background)
+                self.activity_tracker.touch('email', email, user.last_active)
+                # Upgrade hashes made at an old cost without a password reset
+                old_hash = user.password_hash
+                if self.password_hasher.needs_rehash(old_hash):
+                    self.password_hasher.rehash_in_background(
+                        password,
+                        lambda new_hash: self.db.users.update_one(
+                            {'email': email, 'password_hash': old_hash},
+                            {'$set': {'password_hash': new_hash}}
+                        )
+                    )
+                log_event(logger, 'user_authenticated', logging.DEBUG, user_id=user.user_id)
+                # Return user without password hash
+                return user.replace(password_hash=None)
             else:
-                logger.info(f"Invalid password for user: {email}")
+                log_event(logger, 'login_bad_password', user_id=user.user_id)
                 return {"error": "Invalid email or password."}
                 
+        except HasherBusy:
+            logger.warning("Password hashing pool saturated during login")
+            return {"error": "Server is busy, please try again shortly.", "busy": True}
         except Exception as e:
             logger.error(f"Error authenticating user: {e}")
             return {"error": f"Authentication error: {str(e)}"}
     
-    def get_user_by_id(self, user_id):
-        """Get user by user_id"""
+    def get_user_by_id(self, user_id, fresh=False):
+        """Get the ProfileView of a user by user_id; fresh=True skips the
+        per-worker cache (which can lag writes made by other workers)"""
         if self.db is None:
             logger.error("Database is None in get_user_by_id")
             return None
         
+        cached = None if fresh else self.user_cache.get(user_id)
+        if cached is not None:
+            return cached
+        
         try:
-            logger.info(f"Searching for user_id: {user_id}")
-            user = self.db.users.find_one({'user_id': user_id})
-            logger.info(f"Query result: {user}")
-            if user and 'password_hash' in user:
-                del user['password_hash']
+            user = ProfileView.from_document(
+                self.db.users.find_one({'user_id': user_id}, ProfileView.PROJECTION)
+            )
+            log_event(logger, 'user_lookup', logging.DEBUG, user_id=user_id, found=user is not None)
+            if user:
+                self.user_cache.set(user_id, user)
             return user
         except Exception as e:
             logger.error(f"Error getting user by ID: {e}")
             return None
     
     def get_user_by_email(self, email):
-        """Get user by email"""
+        """Get the ProfileView of a user by email"""
         if self.db is None:
             return None
         
         try:
-            user = self.db.users.find_one({'email': email})
-            if user and 'password_hash' in user:
-                del user['password_hash']
-            return user
+            return ProfileView.from_document(
+                self.db.users.find_one({'email': email}, ProfileView.PROJECTION)
+            )
         except Exception as e:
             logger.error(f"Error getting user by email: {e}")
             return None
@@ -326,12 +439,13 @@ class Database:
                 'created_at': datetime.utcnow(),
                 'last_active': datetime.utcnow(),
                 'usage_count': 0,
-                'is_premium': False,
-                'generations': []
+                'is_premium': False
             }
             
             result = self.db.users.insert_one(user_doc)
             if result.inserted_id:
+                self.increment_stats_counters({'total_users': 1})
+                self.rollups.record('signups')
                 return user_doc
             
         except Exception as e:
@@ -339,19 +453,12 @@ class Database:
             return None
     
     def update_user_activity(self, fingerprint):
-        """Update user's last activity timestamp"""
+        """Update user's last activity timestamp (coalesced, written in the background)"""
         if self.db is None:
             return False
         
-        try:
-            result = self.db.users.update_one(
-                {'fingerprint': fingerprint},
-                {'$set': {'last_active': datetime.utcnow()}}
-            )
-            return result.modified_count > 0
-        except Exception as e:
-            logger.error(f"Error updating user activity: {e}")
-            return False
+        self.activity_tracker.touch('fingerprint', fingerprint)
+        return True
     
     def increment_usage(self, user_id):
         """Increment user's usage count"""
@@ -361,92 +468,516 @@ class Database:
         try:
             result = self.db.users.update_one(
                 {'user_id': user_id},
-                {
-                    '$inc': {'usage_count': 1},
-                    '$set': {'last_active': datetime.utcnow()}
-                }
+                {'$inc': {'usage_count': 1}}
+            )
+            cached = self.user_cache.get(user_id)
+            self.activity_tracker.touch('user_id', user_id, cached.last_active if cached else None)
+            self.user_cache.patch(
+                user_id,
+                lambda user: user.replace(usage_count=user.usage_count + 1)
             )
             return result.modified_count > 0
         except Exception as e:
             logger.error(f"Error incrementing usage: {e}")
             return False
     
+    def reserve_usage(self, user_id, limit, count=1):
+        """Atomically reserve `count` free-trial generation slots.
+
+        Returns the updated QuotaView when the slots were reserved, or None
+        when the user is premium, missing or does not have `count` slots
+        left; raises DatabaseUnavailable when MongoDB cannot answer. The
+        check and the increment happen in a single round trip, so
+        concurrent requests from the same user cannot overspend the quota.
+        """
+        if self.db is None:
+            raise DatabaseUnavailable("Database connection not available")
+        if count > limit:
+            return None
+        
+        try:
+            user = self.db.users.find_one_and_update(
+                {
+                    'user_id': user_id,
+                    'is_premium': {'$ne': True},
+                    '$or': [
+                        {'usage_count': {'$lte': limit - count}},
+                        {'usage_count': {'$exists': False}}
+                    ]
+                },
+                {
+                    '$inc': {'usage_count': count},
+                    '$set': {'last_active': datetime.utcnow()}
+                },
+                projection=QuotaView.PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            return self._refresh_cached_quota(user_id, user)
+        except Exception as e:
+            logger.error(f"Error reserving usage: {e}")
+            raise DatabaseUnavailable(str(e)) from e
+    
+    def release_usage(self, user_id, count=1):
+        """Refund slots taken by reserve_usage when generation fails"""
+        if self.db is None:
+            return None
+        
+        try:
+            user = self.db.users.find_one_and_update(
+                {'user_id': user_id, 'usage_count': {'$gte': count}},
+                {'$inc': {'usage_count': -count}},
+                projection=QuotaView.PROJECTION,
+                return_document=ReturnDocument.AFTER
+            )
+            return self._refresh_cached_quota(user_id, user)
+        except Exception as e:
+            logger.error(f"Error releasing usage: {e}")
+            return None
+    
+    def _refresh_cached_quota(self, user_id, document):
+        """QuotaView of an updated document, copied into the cached profile"""
+        quota = QuotaView.from_document(document)
+        if quota is not None:
+            self.user_cache.patch(user_id, lambda user: user.replace(**quota.to_dict()))
+        return quota
+    
     def upgrade_to_premium(self, user_id):
         """Upgrade user to premium"""
         if self.db is None:
             return False
         
         try:
-            result = self.db.users.update_one(
+            previous = self.db.users.find_one_and_update(
                 {'user_id': user_id},
                 {
                     '$set': {
                         'is_premium': True,
                         'upgraded_at': datetime.utcnow()
                     }
-                }
+                },
+                projection={'is_premium': True},
+                return_document=ReturnDocument.BEFORE
             )
-            return result.modified_count > 0
+            self.user_cache.invalidate(user_id)
+            if previous is None:
+                return False
+            if not previous.get('is_premium', False):
+                self.increment_stats_counters({'premium_users': 1})
+                self.rollups.record('premium_upgrades')
+            return True
         except Exception as e:
             logger.error(f"Error upgrading to premium: {e}")
             return False
     
-    def log_generation(self, user_id, data, summaries):
-        """Log a resume generation"""
+    def _generation_doc(self, user_id, data, summaries, source, timestamp):
+        return {
+            'generation_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'timestamp': timestamp,
+            'input_data': data,
+            'generated_summaries': summaries,
+            'source': source,
+            'ip_address': data.get('ip_address'),
+            'user_agent': data.get('user_agent')
+        }
+    
+    def log_generation(self, user_id, data, summaries, source=None):
+        """Log a resume generation (buffered, written in the background)"""
+        return self.log_generations(user_id, [(data, summaries, source)])
+    
+    def log_generations(self, user_id, entries):
+        """Log several generations; entries is a list of
+        (data, summaries, source) tuples.
+
+        Records go to the write-behind generation logger, so this never waits
+        on Mongo. Returns False if the database is unavailable or the buffer
+        was full.
+        """
+        if self.db is None or not entries:
+            return False
+        
+        now = datetime.utcnow()
+        generation_docs = [
+            self._generation_doc(user_id, data, summaries, source, now)
+            for data, summaries, source in entries
+        ]
+        queued = [doc for doc in generation_docs if self.generation_logger.log(doc)]
+        return len(queued) == len(generation_docs)
+    
+    def write_generations(self, generation_docs, write_concern=None):
+        """Persist buffered generation records with one insert_many.
+        Called from the generation logger's flush thread."""
+        if self.db is None or not generation_docs:
+            return
+        
+        generations = self.db.generations
+        if write_concern is not None:
+            generations = generations.with_options(write_concern=write_concern)
+        
+        try:
+            result = generations.insert_many(generation_docs, ordered=False)
+            inserted = len(result.inserted_ids)
+        except BulkWriteError as e:
+            # ordered=False keeps going past individual failures
+            logger.error(f"Some generation records failed to insert: {e.details.get('writeErrors', [])[:1]}")
+            inserted = e.details.get('nInserted', 0)
+        
+        if inserted:
+            self.increment_stats_counters({'total_generations': inserted})
+    
+    def get_generation_history(self, user_id, limit=20, before=None):
+        """Page through a user's generations, newest first.
+
+        Uses keyset pagination on the (user_id, timestamp, _id) index:
+        `before` is the (timestamp, _id) of the last item of the previous
+        page, so each page costs the same regardless of history size.
+        Returns (items, next_key) where next_key is None on the last page.
+        """
+        if self.db is None:
+            return [], None
+        
+        query = {'user_id': user_id}
+        if before is not None:
+            timestamp, last_id = before
+            query['$or'] = [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': last_id}}
+            ]
+        
+        try:
+            items = list(
+                self.db.generations.find(query, {
+                    'generation_id': True,
+                    'timestamp': True,
+                    'generated_summaries': True,
+                    'input_data.current_job_title': True
+                })
+                .sort([('timestamp', -1), ('_id', -1)])
+                .limit(limit + 1)
+            )
+        except Exception as e:
+            logger.error(f"Error getting generation history: {e}")
+            return [], None
+        
+        next_key = None
+        if len(items) > limit:
+            items = items[:limit]
+            next_key = (items[-1]['timestamp'], items[-1]['_id'])
+        return items, next_key
+    
+    def get_cached_summaries(self, cache_key):
+        """Look up previously generated summaries by normalized input hash"""
+        if self.db is None:
+            return None
+        
+        try:
+            doc = self.db.summary_cache.find_one({'_id': cache_key}, {'summaries': True})
+            return doc['summaries'] if doc else None
+        except Exception as e:
+            logger.error(f"Error reading summary cache: {e}")
+            return None
+    
+    def store_cached_summaries(self, cache_key, summaries):
+        """Upsert generated summaries; expiry is handled by the TTL index"""
+        if self.db is None:
+            return False
+        
+        try:
+            self.db.summary_cache.update_one(
+                {'_id': cache_key},
+                {'$set': {'summaries': summaries, 'created_at': datetime.utcnow()}},
+                upsert=True
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error writing summary cache: {e}")
+            return False
+    
+    def acquire_lease(self, key, ttl_seconds):
+        """Try to take a short-lived cross-worker lease; True if acquired"""
+        if self.db is None:
+            return True
+        
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        try:
+            self.db.leases.insert_one({'_id': key, 'expires_at': expires_at})
+            return True
+        except DuplicateKeyError:
+            # Take over a lease whose holder died without releasing it
+            taken = self.db.leases.find_one_and_update(
+                {'_id': key, 'expires_at': {'$lt': now}},
+                {'$set': {'expires_at': expires_at}}
+            )
+            return taken is not None
+        except Exception as e:
+            logger.error(f"Error acquiring lease: {e}")
+            return True
+    
+    def release_lease(self, key):
         if self.db is None:
             return False
         
         try:
-            generation_doc = {
-                'generation_id': str(uuid.uuid4()),
-                'user_id': user_id,
-                'timestamp': datetime.utcnow(),
-                'input_data': data,
-                'generated_summaries': summaries,
-                'ip_address': data.get('ip_address'),
-                'user_agent': data.get('user_agent')
-            }
-            
-            # Insert generation record
-            result = self.db.generations.insert_one(generation_doc)
-            
-            # Update user's generation list
-            if result.inserted_id:
-                self.db.users.update_one(
-                    {'user_id': user_id},
-                    {'$push': {'generations': generation_doc['generation_id']}}
-                )
-            
+            self.db.leases.delete_one({'_id': key})
+            return True
+        except Exception as e:
+            logger.error(f"Error releasing lease: {e}")
+            return False
+    
+    def create_job(self, job_doc):
+        """Insert a queued generation job"""
+        if self.db is None:
+            return False
+        
+        try:
+            result = self.db.jobs.insert_one(job_doc)
             return result.inserted_id is not None
         except Exception as e:
-            logger.error(f"Error logging generation: {e}")
+            logger.error(f"Error creating job: {e}")
             return False
     
+    def claim_job(self, worker_id, lease_seconds):
+        """Atomically claim the oldest queued job (or one whose worker died)"""
+        if self.db is None:
+            return None
+        
+        now = datetime.utcnow()
+        try:
+            return self.db.jobs.find_one_and_update(
+                {
+                    '$or': [
+                        {'status': 'queued'},
+                        {'status': 'running', 'lease_expires_at': {'$lt': now}}
+                    ]
+                },
+                {
+                    '$set': {
+                        'status': 'running',
+                        'worker': worker_id,
+                        'started_at': now,
+                        'updated_at': now,
+                        'lease_expires_at': now + timedelta(seconds=lease_seconds)
+                    },
+                    '$inc': {'attempts': 1}
+                },
+                sort=[('created_at', 1)],
+                return_document=ReturnDocument.AFTER
+            )
+        except Exception as e:
+            logger.error(f"Error claiming job: {e}")
+            return None
+    
+    def update_job(self, job_id, fields):
+        if self.db is None:
+            return False
+        
+        try:
+            fields = dict(fields, updated_at=datetime.utcnow())
+            result = self.db.jobs.update_one({'_id': job_id}, {'$set': fields})
+            return result.matched_count > 0
+        except Exception as e:
+            logger.error(f"Error updating job: {e}")
+            return False
+    
+    def get_job(self, job_id):
+        if self.db is None:
+            return None
+        
+        try:
+            return self.db.jobs.find_one({'_id': job_id})
+        except Exception as e:
+            logger.error(f"Error getting job: {e}")
+            return None
+    
     def get_usage_stats(self):
-        """Get usage statistics"""
+        """Get usage statistics (materialized counters, cached briefly)"""
         if self.db is None:
             return {}
         
         try:
-            total_users = self.db.users.count_documents({})
-            total_generations = self.db.generations.count_documents({})
-            premium_users = self.db.users.count_documents({'is_premium': True})
-            
-            # Recent activity (last 24 hours)
-            yesterday = datetime.utcnow() - timedelta(days=1)
-            recent_users = self.db.users.count_documents({'last_active': {'$gte': yesterday}})
-            recent_generations = self.db.generations.count_documents({'timestamp': {'$gte': yesterday}})
-            
+            return self.stats_engine.get()
+        except Exception as e:
+            logger.error(f"Error getting usage stats: {e}")
+            return {}
+    
+    def increment_stats_counters(self, increments):
+        """Bump the materialized totals in the stats collection"""
+        if self.db is None:
+            return False
+        
+        try:
+            self.db.stats.update_one({'_id': 'totals'}, {'$inc': increments}, upsert=True)
+            return True
+        except Exception as e:
+            logger.error(f"Error updating stats counters: {e}")
+            return False
+    
+    def get_stats_counters(self):
+        if self.db is None:
+            return None
+        
+        try:
+            return self.db.stats.find_one({'_id': 'totals'})
+        except Exception as e:
+            logger.error(f"Error reading stats counters: {e}")
+            return None
+    
+    def seed_stats_counters(self):
+        """Recount the totals from the collections (first run or repair)"""
+        if self.db is None:
+            return None
+        
+        try:
+            counters = {
+                'total_users': self.db.users.count_documents({}),
+                'premium_users': self.db.users.count_documents({'is_premium': True}),
+                'total_generations': self.db.generations.count_documents({}),
+                'seeded': True,
+                'seeded_at': datetime.utcnow()
+            }
+            self.db.stats.update_one({'_id': 'totals'}, {'$set': counters}, upsert=True)
+            logger.info("Seeded stats counters from collections")
+            return counters
+        except Exception as e:
+            logger.error(f"Error seeding stats counters: {e}")
+            return None
+    
+    def count_recent_activity(self, since):
+        """Recent users and generations in one $facet aggregation"""
+        if self.db is None:
+            return {}
+        
+        pipeline = [
+            {'$match': {'last_active': {'$gte': since}}},
+            {'$project': {'_id': 0, 'kind': {'$literal': 'user'}}},
+            {'$unionWith': {
+                'coll': 'generations',
+                'pipeline': [
+                    {'$match': {'timestamp': {'$gte': since}}},
+                    {'$project': {'_id': 0, 'kind': {'$literal': 'generation'}}}
+                ]
+            }},
+            {'$facet': {
+                'recent_users': [{'$match': {'kind': 'user'}}, {'$count': 'count'}],
+                'recent_generations': [{'$match': {'kind': 'generation'}}, {'$count': 'count'}]
+            }}
+        ]
+        
+        try:
+            result = next(self.db.users.aggregate(pipeline), {})
             return {
-                'total_users': total_users,
-                'total_generations': total_generations,
-                'premium_users': premium_users,
-                'recent_users': recent_users,
-                'recent_generations': recent_generations
+                field: result[field][0]['count'] if result.get(field) else 0
+                for field in ('recent_users', 'recent_generations')
             }
         except Exception as e:
-            logger.error(f"Error getting usage stats: {e}")
+            logger.error(f"Error counting recent activity: {e}")
             return {}
+    
+    def write_last_active(self, updates, granularity):
+        """Apply coalesced last_active updates with one bulk_write.
+
+        Each update only matches when the stored value is older than the
+        granularity, so already-fresh documents are not rewritten.
+        """
+        if self.db is None or not updates:
+            return
+        
+        self.db.users.bulk_write([
+            UpdateOne(
+                {field: value, 'last_active': {'$lt': timestamp - granularity}},
+                {'$set': {'last_active': timestamp}}
+            )
+            for (field, value), timestamp in updates.items()
+        ], ordered=False)
+    
+    def write_rollups(self, pending):
+        """Apply buffered rollup increments with one bulk_write"""
+        if self.db is None or not pending:
+            return
+        
+        self.db.rollups.bulk_write([
+            UpdateOne(
+                {'_id': bucket_id(granularity, bucket)},
+                {
+                    '$inc': counts,
+                    '$setOnInsert': {'granularity': granularity, 'bucket': bucket}
+                },
+                upsert=True
+            )
+            for (granularity, bucket), counts in pending.items()
+        ], ordered=False)
+    
+    def get_rollups(self, granularity, start, end):
+        """Rollup buckets in [start, end), oldest first"""
+        if self.db is None:
+            return []
+        
+        try:
+            return list(self.db.rollups.find(
+                {'granularity': granularity, 'bucket': {'$gte': start, '$lt': end}},
+                {'_id': False}
+            ).sort('bucket', 1))
+        except Exception as e:
+            logger.error(f"Error reading rollups: {e}")
+            return []
+    
+    def backfill_rollups(self, since):
+        """Rebuild rollup buckets from the raw collections.
+
+        Overwrites the counts of every bucket from `since` onwards, so run it
+        while traffic is low. Generations logged before sources were recorded
+        only contribute to the total, and premium generations (which are not
+        logged) are missing from history.
+        """
+        if self.db is None:
+            return 0
+        
+        def bucket_expr(field, granularity):
+            parts = {'year': {'$year': field}, 'month': {'$month': field}, 'day': {'$dayOfMonth': field}}
+            if granularity == 'hour':
+                parts['hour'] = {'$hour': field}
+            return {'$dateFromParts': parts}
+        
+        operations = []
+        for granularity in GRANULARITIES:
+            buckets = {}
+            
+            def add(bucket, field, count):
+                counts = buckets.setdefault(bucket, {name: 0 for name in ROLLUP_FIELDS})
+                counts[field] += count
+            
+            for row in self.db.generations.aggregate([
+                {'$match': {'timestamp': {'$gte': since}}},
+                {'$group': {
+                    '_id': {'bucket': bucket_expr('$timestamp', granularity), 'source': '$source'},
+                    'count': {'$sum': 1}
+                }}
+            ]):
+                add(row['_id']['bucket'], 'generations', row['count'])
+                source_field = SOURCE_FIELDS.get(row['_id'].get('source'))
+                if source_field:
+                    add(row['_id']['bucket'], source_field, row['count'])
+            
+            for field, date_field in (('signups', 'created_at'), ('premium_upgrades', 'upgraded_at')):
+                for row in self.db.users.aggregate([
+                    {'$match': {date_field: {'$gte': since}}},
+                    {'$group': {'_id': bucket_expr('$' + date_field, granularity), 'count': {'$sum': 1}}}
+                ]):
+                    add(row['_id'], field, row['count'])
+            
+            operations.extend(
+                UpdateOne(
+                    {'_id': bucket_id(granularity, bucket)},
+                    {'$set': dict(counts, granularity=granularity, bucket=bucket)},
+                    upsert=True
+                )
+                for bucket, counts in buckets.items()
+            )
+        
+        if operations:
+            self.db.rollups.bulk_write(operations, ordered=False)
+        return len(operations)
 
 def generate_user_fingerprint(ip_address, user_agent):
     """Generate a unique fingerprint for user tracking"""
@@ -457,9 +988,14 @@ def generate_user_fingerprint(ip_address, user_agent):
 # Global database instance - will be initialized later
 db = None
 
-def initialize_database():
-    """Initialize the database connection after environment variables are loaded"""
+def initialize_database(background=False):
+    """Initialize the database connection after environment variables are loaded.
+    With background=True this returns immediately and connects on a thread;
+    check db.is_ready before relying on it. Under gunicorn --preload
+    (DB_CONNECT_AFTER_FORK=true) no connection is made here; each worker
+    connects from the post_fork hook instead."""
     global db
     if db is None:
-        db = Database()
+        connect = os.getenv('DB_CONNECT_AFTER_FORK', 'false').lower() != 'true'
+        db = Database(background=background, connect=connect)
     return db
@@ -0,0 +1,85 @@
+"""
+Write-behind logger for generation audit records
+
+Database.log_generation hands records to this buffer instead of writing
+them inline, so the request path never waits on the audit write. A
+background thread drains the buffer with insert_many(ordered=False) when it
+reaches GENERATION_LOG_FLUSH_SIZE records or every
+GENERATION_LOG_FLUSH_INTERVAL seconds, whichever comes first. When the
+buffer is full new records are dropped and counted rather than blocking.
+Remaining records are flushed at interpreter shutdown.
+"""
+import os
+import threading
+import logging
+from collections import deque
+from pymongo.write_concern import WriteConcern
+from background import PeriodicFlusher
+
+logger = logging.getLogger(__name__)
+
+
+def parse_write_concern(value):
+    """'majority' or a node count such as '1' or '0'"""
+    value = str(value).strip()
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+
+class GenerationLogger(PeriodicFlusher):
+    thread_name = 'generation-logger'
+
+    def __init__(self, write, max_buffer=None, flush_size=None, flush_interval=None, write_concern=None):
+        super().__init__(flush_interval or float(os.getenv('GENERATION_LOG_FLUSH_INTERVAL', 1)))
+        # write(records, write_concern) persists a list of generation docs
+        self.write = write
+        self.max_buffer = max_buffer or int(os.getenv('GENERATION_LOG_BUFFER', 10000))
+        self.flush_size = flush_size or int(os.getenv('GENERATION_LOG_FLUSH_SIZE', 100))
+        self.write_concern = parse_write_concern(write_concern or os.getenv('GENERATION_LOG_WRITE_CONCERN', '1'))
+        self._buffer = deque()
+        self._flush_lock = threading.Lock()
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def log(self, record):
+        """Buffer a record without blocking; returns False if it was dropped"""
+        self.ensure_flusher()
+        with self._lock:
+            if len(self._buffer) >= self.max_buffer:
+                self.dropped += 1
+                return False
+            self._buffer.append(record)
+            self.enqueued += 1
+            depth = len(self._buffer)
+        if depth >= self.flush_size:
+            self.wake()
+        return True
+
+    def flush(self):
+        """Write everything buffered so far"""
+        with self._flush_lock:
+            while True:
+                with self._lock:
+                    if not self._buffer:
+                        return
+                    batch = [self._buffer.popleft() for _ in range(min(self.flush_size, len(self._buffer)))]
+                try:
+                    self.write(batch, self.write_concern)
+                    self.written += len(batch)
+                except Exception as e:
+                    self.failed += len(batch)
+                    logger.error(f"Failed to write {len(batch)} generation records: {e}")
+
+    def stats(self):
+        with self._lock:
+            depth = len(self._buffer)
+        return {
+            'queue_depth': depth,
+            'max_buffer': self.max_buffer,
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'write_concern': self.write_concern.document.get('w', 1)
+        }
@@ -0,0 +1,86 @@
+"""
+gunicorn configuration (loaded automatically from the working directory)
+
+Worker class and count are sized from the CPU count:
+  - gthread (default): CPU + 1 workers x GUNICORN_THREADS threads; suits
+    this app, which mostly waits on MongoDB and the summary API
+  - gevent: one worker per CPU with GUNICORN_WORKER_CONNECTIONS greenlets
+    (falls back to gthread when gevent is not installed)
+  - sync: 2 x CPU + 1 single-threaded workers
+WEB_CONCURRENCY overrides the worker count.
+
+The app is preloaded in the master, so workers fork with the code already
+imported, but MongoDB clients must not cross a fork: DB_CONNECT_AFTER_FORK
+stops the master from connecting, and each worker connects (and opens its
+upstream session) as soon as it boots.
+MONGO_POOL_THREADS tells database.mongo_pool_options() how many threads
+each worker's pool has to serve.
+
+With more than one worker, async generation jobs default to the mongo
+backend: a local job lives in the worker that accepted it, so polling
+/api/jobs/<id> from any other worker would answer 404.
+"""
+import os
+import multiprocessing
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    try:
+        import gevent  # noqa: F401
+    except ImportError:
+        worker_class = 'gthread'
+
+if worker_class == 'gevent':
+    default_workers = cpus
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+    concurrency_per_worker = worker_connections
+elif worker_class == 'gthread':
+    default_workers = cpus + 1
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+    concurrency_per_worker = threads
+else:
+    default_workers = 2 * cpus + 1
+    concurrency_per_worker = 1
+
+workers = int(os.getenv('WEB_CONCURRENCY', default_workers))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Read by database.py in the master (while preloading) and in workers
+os.environ['MONGO_POOL_THREADS'] = str(concurrency_per_worker)
+if preload_app:
+    os.environ['DB_CONNECT_AFTER_FORK'] = 'true'
+if workers > 1:
+    os.environ.setdefault('JOB_QUEUE_BACKEND', 'mongo')
+
+
+def when_ready(server):
+    server.log.info(
+        f"{workers} {worker_class} worker(s), {concurrency_per_worker} concurrent request(s) each"
+    )
+    if workers > 1 and os.environ.get('JOB_QUEUE_BACKEND') == 'local':
+        server.log.warning(
+            "JOB_QUEUE_BACKEND=local with several workers: async job status "
+            "polls that reach another worker will answer 404"
+        )
+
+
+def post_fork(server, worker):
+    # Workers create their own clients from here on
+    os.environ.pop('DB_CONNECT_AFTER_FORK', None)
+    # Only set if something created the database while preloading
+    import database
+    if database.db is not None:
+        database.db.after_fork()
+
+
+def post_worker_init(worker):
+    # The app creates its database and upstream session lazily; start both
+    # now so the worker's first request does not pay for them
+    import app
+    app.warm_up()
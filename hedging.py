@@ -0,0 +1,130 @@
+"""
+Latency-budgeted upstream calls with request hedging
+
+Each call runs on a small per-worker thread pool. If the upstream has not
+answered within the rolling p95 of recent successful calls, a single hedged
+duplicate is sent and whichever finishes first wins. If nothing has answered
+by the deadline the caller gets DeadlineExceeded and can fall back, while the
+stragglers finish in the background (bounded by the upstream read timeout).
+"""
+import os
+import time
+import threading
+import logging
+from collections import deque
+from concurrent.futures import wait, FIRST_COMPLETED
+from upstream import UpstreamError
+from background import PerProcessExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class DeadlineExceeded(UpstreamError):
+    """The upstream did not answer within the latency budget"""
+
+
+class LatencyTracker:
+    def __init__(self, window=200):
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency):
+        with self._lock:
+            self._samples.append(latency)
+
+    def percentile(self, pct):
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return None
+        index = min(len(samples) - 1, int(round(pct / 100.0 * (len(samples) - 1))))
+        return samples[index]
+
+    def __len__(self):
+        return len(self._samples)
+
+
+class HedgedCaller:
+    def __init__(self, max_workers=None, hedge_delay=None, min_samples=None):
+        # One thread per pooled upstream connection by default; more threads
+        # than connections would open sockets the pool then discards
+        self.max_workers = max_workers or int(os.getenv('HEDGE_POOL_SIZE') or os.getenv('UPSTREAM_POOL_SIZE', 10))
+        # Used until enough samples exist for a meaningful p95
+        self.default_hedge_delay = hedge_delay or float(os.getenv('HEDGE_DELAY_SECONDS', 3))
+        self.min_samples = min_samples or int(os.getenv('HEDGE_MIN_SAMPLES', 20))
+        self.latency = LatencyTracker()
+        self._pool = PerProcessExecutor(self.max_workers, 'upstream')
+        self.calls = 0
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.deadline_exceeded = 0
+
+    @property
+    def executor(self):
+        return self._pool.get()
+
+    def hedge_delay(self):
+        if len(self.latency) < self.min_samples:
+            return self.default_hedge_delay
+        return self.latency.percentile(95)
+
+    def _timed(self, fn):
+        start = time.monotonic()
+        result = fn()
+        self.latency.record(time.monotonic() - start)
+        return result
+
+    def call(self, fn, deadline):
+        """Return fn()'s result within deadline seconds, hedging once if slow"""
+        self.calls += 1
+        if deadline <= 0:
+            # No budget left: do not start a request whose answer is discarded
+            self.deadline_exceeded += 1
+            raise DeadlineExceeded("No latency budget left for the upstream call")
+        start = time.monotonic()
+        end = start + deadline
+        hedge_at = start + self.hedge_delay()
+        primary = self.executor.submit(self._timed, fn)
+        pending = {primary}
+        hedged = False
+        last_error = None
+
+        while pending:
+            now = time.monotonic()
+            if now >= end:
+                break
+
+            wait_until = end if hedged else min(end, hedge_at)
+            done, pending = wait(pending, timeout=max(0, wait_until - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                if future is not primary:
+                    self.hedge_wins += 1
+                return result
+
+            if last_error is not None and not pending:
+                raise last_error
+
+            if not hedged and not done and time.monotonic() >= hedge_at and time.monotonic() < end:
+                logger.info(f"Upstream slower than {hedge_at - start:.2f}s, sending hedged request")
+                pending.add(self.executor.submit(self._timed, fn))
+                hedged = True
+                self.hedges_sent += 1
+
+        self.deadline_exceeded += 1
+        raise DeadlineExceeded(f"Upstream did not answer within {deadline:.1f}s")
+
+    def stats(self):
+        p95 = self.latency.percentile(95)
+        return {
+            'calls': self.calls,
+            'hedges_sent': self.hedges_sent,
+            'hedge_wins': self.hedge_wins,
+            'deadline_exceeded': self.deadline_exceeded,
+            'latency_p95_seconds': round(p95, 3) if p95 is not None else None,
+            'hedge_delay_seconds': round(self.hedge_delay(), 3)
+        }
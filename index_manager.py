@@ -0,0 +1,156 @@
+"""
+MongoDB index declarations, provisioning and verification
+
+Every index the app relies on is declared once in REQUIRED_INDEXES.
+Database builds them in a background thread at startup; create_index is
+idempotent, so restarts and concurrent workers are harmless.
+
+Run as a script to check which known query shapes would still scan a
+whole collection:
+
+    python index_manager.py report
+    python index_manager.py build
+"""
+import os
+import sys
+import threading
+import logging
+from datetime import datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# (collection, keys, options)
+REQUIRED_INDEXES = [
+    # Accounts created through signup have an email; fingerprint-only users
+    # do not, so uniqueness is only enforced where the field is present
+    ('users', [('email', 1)], {'name': 'users_email_unique', 'unique': True,
+                               'partialFilterExpression': {'email': {'$type': 'string'}}}),
+    ('users', [('user_id', 1)], {'name': 'users_user_id_unique', 'unique': True}),
+    ('users', [('fingerprint', 1)], {'name': 'users_fingerprint', 'sparse': True}),
+    ('users', [('last_active', 1)], {'name': 'users_last_active'}),
+    ('generations', [('timestamp', 1)], {'name': 'generations_timestamp'}),
+    ('generations', [('user_id', 1), ('timestamp', -1), ('_id', -1)], {'name': 'generations_user_timestamp'}),
+    ('summary_cache', [('created_at', 1)], {'name': 'summary_cache_ttl',
+                                            'expireAfterSeconds': int(os.getenv('SUMMARY_CACHE_TTL', 86400)) or 86400}),
+    ('leases', [('expires_at', 1)], {'name': 'leases_ttl', 'expireAfterSeconds': 0}),
+    ('jobs', [('status', 1), ('created_at', 1)], {'name': 'jobs_status_created'}),
+    ('jobs', [('expires_at', 1)], {'name': 'jobs_ttl', 'expireAfterSeconds': 0}),
+    ('rollups', [('granularity', 1), ('bucket', 1)], {'name': 'rollups_granularity_bucket'}),
+]
+
+
+def query_shapes():
+    """Representative queries issued by Database, used by report()"""
+    recent = datetime.utcnow() - timedelta(days=1)
+    return [
+        ('users', {'email': 'user@example.com'}, None),
+        ('users', {'user_id': 'user-id'}, None),
+        ('users', {'fingerprint': 'fingerprint'}, None),
+        ('users', {'last_active': {'$gte': recent}}, None),
+        ('generations', {'timestamp': {'$gte': recent}}, None),
+        ('generations', {'user_id': 'user-id'}, [('timestamp', -1), ('_id', -1)]),
+        ('jobs', {'status': 'queued'}, [('created_at', 1)]),
+    ]
+
+
+def _stages(plan):
+    """Yield every stage name in an explain() plan tree"""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        yield from _stages(plan.get(key))
+    for child in plan.get('inputStages', []):
+        yield from _stages(child)
+
+
+class IndexManager:
+    def __init__(self, database):
+        self.database = database
+        self.built = []
+        self.failed = []
+        self._thread = None
+
+    def build(self):
+        """Create every declared index; failures are logged, not raised"""
+        db = self.database.db
+        if db is None:
+            return False
+
+        for collection, keys, options in REQUIRED_INDEXES:
+            try:
+                db[collection].create_index(keys, **options)
+                self.built.append(options['name'])
+            except Exception as e:
+                self.failed.append(options['name'])
+                logger.error(f"Failed to create index {options['name']} on {collection}: {e}")
+
+        logger.info(f"Index provisioning finished: {len(self.built)} ok, {len(self.failed)} failed")
+        return not self.failed
+
+    def build_in_background(self):
+        if self.database.db is None:
+            return None
+        self._thread = threading.Thread(target=self.build, name='index-builder', daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def report(self):
+        """Explain each known query shape and flag the ones doing COLLSCAN"""
+        db = self.database.db
+        if db is None:
+            return []
+
+        results = []
+        for collection, query, sort in query_shapes():
+            cursor = db[collection].find(query)
+            if sort:
+                cursor = cursor.sort(sort)
+            try:
+                plan = cursor.explain().get('queryPlanner', {}).get('winningPlan', {})
+                stages = list(_stages(plan))
+                results.append({
+                    'collection': collection,
+                    'query': query,
+                    'stages': stages,
+                    'indexed': 'COLLSCAN' not in stages
+                })
+            except Exception as e:
+                results.append({'collection': collection, 'query': query, 'error': str(e), 'indexed': False})
+        return results
+
+    def stats(self):
+        return {
+            'declared': len(REQUIRED_INDEXES),
+            'built': len(self.built),
+            'failed': self.failed,
+            'building': self._thread is not None and self._thread.is_alive()
+        }
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from database import Database
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else 'report'
+
+    database = Database(build_indexes=False)
+    if database.db is None:
+        print("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    manager = IndexManager(database)
+    if command == 'build':
+        sys.exit(0 if manager.build() else 1)
+
+    missing = 0
+    for result in manager.report():
+        if result['indexed']:
+            print(f"✅ {result['collection']} {result['query']} -> {' > '.join(result['stages'])}")
+        else:
+            missing += 1
+            print(f"❌ {result['collection']} {result['query']} -> {result.get('error') or ' > '.join(result['stages'])}")
+    sys.exit(1 if missing else 0)
@@ -0,0 +1,218 @@
+"""
+Asynchronous generation jobs
+
+Lets /api/generate-summary?async=1 return a job id immediately while a pool
+of background threads does the slow upstream work. Two backends:
+
+- local: an in-process queue and job store, for single-node runs
+- mongo: jobs live in the `jobs` collection and any worker process can
+  claim them, for multi-worker deployments
+
+Each process runs one poller thread that claims a job only when one of its
+JOB_CONCURRENCY pool threads is free and hands it to the pool. When nothing
+is queued the mongo poller backs off from JOB_POLL_INTERVAL up to
+JOB_POLL_MAX_INTERVAL; a submit in the same process wakes it at once.
+
+Finished jobs expire after JOB_TTL_SECONDS in both backends.
+"""
+import os
+import time
+import uuid
+import queue
+import threading
+import logging
+from datetime import datetime, timedelta
+from ttl_cache import TTLCache
+from background import PerProcessExecutor
+
+logger = logging.getLogger(__name__)
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+class LocalJobBackend:
+    def __init__(self, ttl, max_jobs=None):
+        self.jobs = TTLCache(max_jobs or int(os.getenv('JOB_LOCAL_MAX', 10000)), ttl)
+        self.pending = queue.Queue()
+
+    def create(self, job):
+        self.jobs.set(job['_id'], job)
+        self.pending.put(job['_id'])
+
+    def claim(self, worker_id, timeout):
+        try:
+            job_id = self.pending.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        self.update(job_id, {'status': RUNNING, 'worker': worker_id})
+        return job
+
+    def update(self, job_id, fields):
+        self.jobs.patch(job_id, lambda job: {**job, **fields, 'updated_at': datetime.utcnow()})
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def depth(self):
+        return self.pending.qsize()
+
+
+class MongoJobBackend:
+    def __init__(self, database, lease_seconds=None):
+        self.database = database
+        self.lease_seconds = lease_seconds or float(os.getenv('JOB_LEASE_SECONDS', 120))
+        # Set by create() so this process's poller does not sleep through
+        # its own submissions
+        self._wakeup = threading.Event()
+
+    def create(self, job):
+        if not self.database.create_job(job):
+            raise RuntimeError("Failed to enqueue job")
+        self._wakeup.set()
+
+    def claim(self, worker_id, timeout):
+        job = self.database.claim_job(worker_id, self.lease_seconds)
+        if job is None:
+            self._wakeup.wait(timeout)
+            self._wakeup.clear()
+        return job
+
+    def update(self, job_id, fields):
+        self.database.update_job(job_id, fields)
+
+    def get(self, job_id):
+        return self.database.get_job(job_id)
+
+    def depth(self):
+        return None
+
+
+class JobQueue:
+    def __init__(self, handler, database=None, backend=None, concurrency=None, ttl=None,
+                 poll_interval=None, max_poll_interval=None):
+        self.handler = handler
+        self.ttl = ttl or int(os.getenv('JOB_TTL_SECONDS', 3600))
+        self.concurrency = concurrency or int(os.getenv('JOB_CONCURRENCY', 4))
+        self.poll_interval = poll_interval or float(os.getenv('JOB_POLL_INTERVAL', 1))
+        self.max_poll_interval = max(
+            self.poll_interval,
+            max_poll_interval or float(os.getenv('JOB_POLL_MAX_INTERVAL', 10))
+        )
+        backend = backend or os.getenv('JOB_QUEUE_BACKEND', 'local')
+
+        # Only check that a database was given: it may still be connecting
+        # (or not even created yet), and its methods fail fast until ready
+        if backend == 'mongo' and database is not None:
+            self.backend = MongoJobBackend(database)
+        else:
+            if backend == 'mongo':
+                logger.warning("Mongo job backend requested but database unavailable, using local backend")
+            self.backend = LocalJobBackend(self.ttl)
+        self.backend_name = 'mongo' if isinstance(self.backend, MongoJobBackend) else 'local'
+
+        self._slots = None
+        self.executor = PerProcessExecutor(self.concurrency, 'job-worker', on_create=self._reset_slots)
+        self._pid = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+
+    def _reset_slots(self):
+        self._slots = threading.BoundedSemaphore(self.concurrency)
+
+    def start(self):
+        """Start this process's poller if it is not running yet. Threads do
+        not survive a fork, so each process starts its own"""
+        pid = os.getpid()
+        if self._pid == pid:
+            return
+        with self._lock:
+            if self._pid == pid:
+                return
+            executor = self.executor.get()
+            threading.Thread(target=self._poll, args=(executor, str(pid)), name='job-poller', daemon=True).start()
+            self._pid = pid
+            logger.info(f"Started {self.backend_name} job poller with {self.concurrency} workers in pid {pid}")
+
+    def submit(self, user_id, payload):
+        """Enqueue a job and return its id"""
+        self.start()
+        now = datetime.utcnow()
+        job = {
+            '_id': str(uuid.uuid4()),
+            'user_id': user_id,
+            'status': QUEUED,
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'attempts': 0,
+            'created_at': now,
+            'updated_at': now,
+            'expires_at': now + timedelta(seconds=self.ttl)
+        }
+        self.backend.create(job)
+        self.submitted += 1
+        return job['_id']
+
+    def get(self, job_id):
+        return self.backend.get(job_id)
+
+    def _poll(self, executor, worker_id):
+        delay = self.poll_interval
+        while True:
+            # Only claim what this process can start now, so queued jobs
+            # stay available to idle workers elsewhere
+            self._slots.acquire()
+            try:
+                job = self.backend.claim(worker_id, timeout=delay)
+            except Exception as e:
+                logger.error(f"Error claiming job: {e}")
+                time.sleep(delay)
+                job = None
+            if job is None:
+                self._slots.release()
+                delay = min(delay * 2, self.max_poll_interval)
+                continue
+
+            delay = self.poll_interval
+            try:
+                executor.submit(self._run, job)
+            except Exception as e:
+                self._slots.release()
+                logger.error(f"Error starting job {job['_id']}: {e}")
+                self.backend.update(job['_id'], {'status': FAILED, 'error': 'Generation failed'})
+
+    def _run(self, job):
+        try:
+            self._execute(job)
+        finally:
+            self._slots.release()
+
+    def _execute(self, job):
+        try:
+            result = self.handler(job)
+        except Exception as e:
+            logger.error(f"Job {job['_id']} failed: {e}")
+            self.failed += 1
+            self.backend.update(job['_id'], {'status': FAILED, 'error': 'Generation failed'})
+            return
+
+        self.succeeded += 1
+        self.backend.update(job['_id'], {'status': SUCCEEDED, 'result': result})
+
+    def stats(self):
+        return {
+            'backend': self.backend_name,
+            'concurrency': self.concurrency,
+            'queue_depth': self.backend.depth(),
+            'submitted': self.submitted,
+            'succeeded': self.succeeded,
+            'failed': self.failed
+        }
@@ -0,0 +1,62 @@
+"""
+Lazily created module-level singletons
+
+LazyObject(factory) stands in for an object that is expensive to import or
+build (the Database pulls in pymongo and bcrypt). The factory runs on first
+attribute access or truth test, so a serverless cold start that only
+serves /health never pays for it. If the factory raises, the error is
+logged, the proxy is falsy, and attribute access re-raises it.
+"""
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+_UNSET = object()
+
+
+class LazyObject:
+    def __init__(self, factory, name=None):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_name', name or getattr(factory, '__name__', 'object'))
+        object.__setattr__(self, '_target', _UNSET)
+        object.__setattr__(self, '_error', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _resolve(self):
+        target = self._target
+        if target is _UNSET:
+            with self._lock:
+                target = self._target
+                if target is _UNSET:
+                    try:
+                        target = self._factory()
+                    except Exception as e:
+                        logger.error(f"Failed to create {self._name}: {e}")
+                        object.__setattr__(self, '_error', e)
+                        target = None
+                    object.__setattr__(self, '_target', target)
+        if target is None and self._error is not None:
+            raise self._error
+        return target
+
+    @property
+    def lazy_loaded(self):
+        """Whether the object exists yet (never triggers creation)"""
+        return self._target is not _UNSET and self._target is not None
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._resolve(), name, value)
+
+    def __bool__(self):
+        try:
+            return bool(self._resolve())
+        except Exception:
+            return False
+
+    def __repr__(self):
+        state = 'loaded' if self.lazy_loaded else 'not loaded'
+        return f"<LazyObject {self._name} ({state})>"
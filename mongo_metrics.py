@@ -0,0 +1,39 @@
+"""
+pymongo command listener feeding the MongoDB metrics in metrics.py
+
+Lives apart from metrics.py so the web tier can import the registry without
+pulling in pymongo; Database passes an instance to every MongoClient.
+"""
+from pymongo import monitoring
+from metrics import MONGO_COMMANDS, MONGO_LATENCY
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Per-command, per-collection latency from pymongo command events"""
+
+    def __init__(self):
+        # (connection_id, request_id) -> collection, since only the started
+        # event carries the command document
+        self._collections = {}
+
+    @staticmethod
+    def _collection(event):
+        target = event.command.get(event.command_name)
+        if isinstance(target, str):
+            return target
+        # getMore and friends name the collection separately
+        return event.command.get('collection', '')
+
+    def started(self, event):
+        self._collections[(event.connection_id, event.request_id)] = self._collection(event)
+
+    def _record(self, event, outcome):
+        collection = self._collections.pop((event.connection_id, event.request_id), '')
+        MONGO_LATENCY.observe(event.duration_micros / 1e6, event.command_name, collection)
+        MONGO_COMMANDS.inc(event.command_name, collection, outcome)
+
+    def succeeded(self, event):
+        self._record(event, 'success')
+
+    def failed(self, event):
+        self._record(event, 'failure')
@@ -0,0 +1,136 @@
+"""
+Bounded bcrypt hashing
+
+bcrypt work runs on a small per-worker thread pool (bcrypt releases the GIL,
+so threads hash in parallel) capped at BCRYPT_MAX_CONCURRENCY, with at most
+BCRYPT_MAX_QUEUE requests waiting. Beyond that, callers get HasherBusy
+immediately instead of piling onto the CPU, so a login burst cannot stall
+every other endpoint on the worker.
+
+The cost factor comes from BCRYPT_ROUNDS. Hashes made with a different cost
+are transparently rehashed after a successful login (needs_rehash). To pick
+a cost for a target hash time on the deployment hardware:
+
+    python password_hasher.py benchmark [target_ms]
+"""
+import os
+import sys
+import time
+import threading
+import logging
+import bcrypt
+from background import PerProcessExecutor
+
+logger = logging.getLogger(__name__)
+
+
+class HasherBusy(Exception):
+    """Too many hashing requests are already queued"""
+
+
+def hash_cost(password_hash):
+    """Cost factor encoded in a bcrypt hash such as $2b$12$..."""
+    if isinstance(password_hash, str):
+        password_hash = password_hash.encode('utf-8')
+    try:
+        return int(password_hash.split(b'$')[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def benchmark(rounds_range=range(10, 15), samples=3):
+    """Average seconds per hash for each cost factor"""
+    timings = {}
+    for rounds in rounds_range:
+        salt = bcrypt.gensalt(rounds)
+        start = time.perf_counter()
+        for _ in range(samples):
+            bcrypt.hashpw(b'benchmark-password', salt)
+        timings[rounds] = (time.perf_counter() - start) / samples
+    return timings
+
+
+def recommend_rounds(timings, target_seconds):
+    """Highest cost whose hash time stays within the target"""
+    fitting = [rounds for rounds, seconds in timings.items() if seconds <= target_seconds]
+    return max(fitting) if fitting else min(timings)
+
+
+class PasswordHasher:
+    def __init__(self, rounds=None, max_concurrency=None, max_queue=None):
+        self.rounds = rounds or int(os.getenv('BCRYPT_ROUNDS', 12))
+        self.max_concurrency = max_concurrency or int(os.getenv('BCRYPT_MAX_CONCURRENCY', 2))
+        self.max_queue = max_queue if max_queue is not None else int(os.getenv('BCRYPT_MAX_QUEUE', 32))
+        self._reset_slots()
+        # Queue slots are per pool, so a new pool after a fork gets fresh ones
+        self._pool = PerProcessExecutor(self.max_concurrency, 'bcrypt', on_create=self._reset_slots)
+        self.rejected = 0
+        self.rehashed = 0
+
+    def _reset_slots(self):
+        self._slots = threading.BoundedSemaphore(self.max_concurrency + self.max_queue)
+
+    @property
+    def executor(self):
+        return self._pool.get()
+
+    def _submit(self, fn, *args):
+        executor = self.executor
+        if not self._slots.acquire(blocking=False):
+            self.rejected += 1
+            raise HasherBusy("Password hashing queue is full")
+        try:
+            future = executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash(self, password):
+        """bcrypt hash of password at the configured cost"""
+        return self._submit(bcrypt.hashpw, password.encode('utf-8'), bcrypt.gensalt(self.rounds)).result()
+
+    def verify(self, password, password_hash):
+        return self._submit(bcrypt.checkpw, password.encode('utf-8'), password_hash).result()
+
+    def needs_rehash(self, password_hash):
+        return hash_cost(password_hash) != self.rounds
+
+    def rehash_in_background(self, password, on_done):
+        """Hash password at the current cost off the request path and pass
+        the new hash to on_done; skipped when the pool is saturated."""
+        def work():
+            new_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(self.rounds))
+            on_done(new_hash)
+            self.rehashed += 1
+
+        try:
+            future = self._submit(work)
+        except HasherBusy:
+            return False
+        future.add_done_callback(
+            lambda f: f.exception() and logger.error(f"Password rehash failed: {f.exception()}")
+        )
+        return True
+
+    def stats(self):
+        return {
+            'rounds': self.rounds,
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'rejected': self.rejected,
+            'rehashed': self.rehashed
+        }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != 'benchmark':
+        print("Usage: python password_hasher.py benchmark [target_ms]")
+        sys.exit(1)
+
+    target_ms = float(sys.argv[2]) if len(sys.argv) > 2 else 250
+    timings = benchmark()
+    for rounds, seconds in timings.items():
+        print(f"rounds={rounds}: {seconds * 1000:.1f} ms")
+    print(f"Recommended BCRYPT_ROUNDS for a {target_ms:.0f} ms target: {recommend_rounds(timings, target_ms / 1000)}")
@@ -4,8 +4,8 @@ This uses a simpler connection method that bypasses SSL completely
 """
 import os
 import logging
-from pymongo import MongoClient
 import ssl
+from connection_selector import ConnectionSelector
 
 logger = logging.getLogger(__name__)
 
@@ -38,32 +38,29 @@ def create_render_compatible_connection():
                 # Create direct connection without SRV
                 cluster_host = host.replace('.mongodb.net', '.mongodb.net')
                 
-                # Try multiple port combinations
+                # Try multiple port combinations at once; the first that
+                # answers ping wins and is remembered for the next boot
                 ports = [27017, 27016, 27015]
+                strategies = [
+                    (
+                        f"direct_port_{port}",
+                        f"mongodb://{username}:{urllib.parse.quote(password)}@{cluster_host}:{port}/{database}?authSource=admin&retryWrites=true&w=majority",
+                        {
+                            'serverSelectionTimeoutMS': 10000,
+                            'connectTimeoutMS': 10000,
+                            'socketTimeoutMS': 10000
+                        }
+                    )
+                    for port in ports
+                ]
                 
-                for port in ports:
-                    try:
-                        # Build direct connection string
-                        direct_uri = f"mongodb://{username}:{urllib.parse.quote(password)}@{cluster_host}:{port}/{database}?authSource=admin&retryWrites=true&w=majority"
-                        
-                        logger.info(f"Trying direct connection on port {port}")
-                        client = MongoClient(
-                            direct_uri,
-                            serverSelectionTimeoutMS=10000,
-                            connectTimeoutMS=10000,
-                            socketTimeoutMS=10000
-                        )
-                        
-                        # Test connection
-                        client.admin.command('ping')
-                        db = client[database or 'resume_generator']
-                        
-                        logger.info(f"✅ Connected successfully using direct connection on port {port}")
-                        return client, db
-                        
-                    except Exception as e:
-                        logger.warning(f"Port {port} failed: {str(e)}")
-                        continue
+                try:
+                    name, client = ConnectionSelector(strategies).select()
+                    db = client[database or 'resume_generator']
+                    logger.info(f"✅ Connected successfully using {name}")
+                    return client, db
+                except ConnectionError as e:
+                    logger.warning(str(e))
         
         logger.error("All Render connection attempts failed")
         return None, None
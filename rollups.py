@@ -0,0 +1,125 @@
+"""
+Hourly and daily rollups of usage events
+
+Events (signups, generations by source, premium upgrades) are counted in
+memory per (granularity, bucket) and flushed every ROLLUP_FLUSH_INTERVAL
+seconds as one bulk_write of $inc upserts into the `rollups` collection, so
+recording an event never touches Mongo on the request path. Each rollup
+document looks like:
+
+    {'_id': 'hour:2024-01-01T10:00:00', 'granularity': 'hour',
+     'bucket': datetime(2024, 1, 1, 10), 'signups': 3, 'generations': 12,
+     'upstream': 9, 'template': 2, 'cache': 1, 'premium_upgrades': 1}
+
+Buckets can be rebuilt from the raw collections with:
+
+    python rollups.py backfill [days]
+"""
+import os
+import sys
+import logging
+from datetime import datetime, timedelta, timezone
+from background import BufferedWriter
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1)
+}
+
+ROLLUP_FIELDS = ['signups', 'generations', 'upstream', 'template', 'cache', 'premium_upgrades']
+
+# generate_resume_summaries source -> rollup field
+SOURCE_FIELDS = {'api': 'upstream', 'template': 'template', 'cache': 'cache'}
+
+
+def to_naive_utc(timestamp):
+    """Buckets are naive UTC (as Mongo returns them); convert aware values"""
+    if timestamp.tzinfo is not None:
+        return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def bucket_start(timestamp, granularity):
+    if granularity == 'hour':
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def bucket_id(granularity, bucket):
+    return f"{granularity}:{bucket.isoformat()}"
+
+
+def fill_series(docs, granularity, start, end):
+    """Return one entry per bucket in [start, end), zero-filling gaps"""
+    by_bucket = {to_naive_utc(doc['bucket']): doc for doc in docs}
+    start, end = to_naive_utc(start), to_naive_utc(end)
+    step = GRANULARITIES[granularity]
+    series = []
+    bucket = bucket_start(start, granularity)
+    while bucket < end:
+        doc = by_bucket.get(bucket, {})
+        entry = {'bucket': bucket.isoformat()}
+        entry.update({field: doc.get(field, 0) for field in ROLLUP_FIELDS})
+        series.append(entry)
+        bucket += step
+    return series
+
+
+class RollupRecorder(BufferedWriter):
+    thread_name = 'rollup-flusher'
+
+    def __init__(self, write, flush_interval=None):
+        super().__init__(flush_interval or float(os.getenv('ROLLUP_FLUSH_INTERVAL', 10)))
+        # write(increments) persists {(granularity, bucket): {field: n}}
+        self.write = write
+        self.flushes = 0
+        self.failed = 0
+
+    def record(self, field, count=1, timestamp=None):
+        """Count an event in the hour and day buckets containing timestamp"""
+        self.ensure_flusher()
+        timestamp = timestamp or datetime.utcnow()
+        with self._lock:
+            for granularity in GRANULARITIES:
+                key = (granularity, bucket_start(timestamp, granularity))
+                counts = self._pending.setdefault(key, {})
+                counts[field] = counts.get(field, 0) + count
+
+    def record_generation(self, source):
+        self.record('generations')
+        if source in SOURCE_FIELDS:
+            self.record(SOURCE_FIELDS[source])
+
+    def write_pending(self, pending):
+        try:
+            self.write(pending)
+            self.flushes += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Error flushing rollups: {e}")
+
+    def stats(self):
+        return {'pending_buckets': self.pending_count, 'flushes': self.flushes, 'failed': self.failed}
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from database import Database
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2 or sys.argv[1] != 'backfill':
+        print("Usage: python rollups.py backfill [days]")
+        sys.exit(1)
+
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+    database = Database(build_indexes=False)
+    if database.db is None:
+        print("❌ Could not connect to MongoDB")
+        sys.exit(1)
+
+    since = bucket_start(datetime.utcnow() - timedelta(days=days), 'day')
+    written = database.backfill_rollups(since)
+    print(f"✅ Rebuilt {written} rollup buckets since {since.date()}")
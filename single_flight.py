@@ -0,0 +1,120 @@
+"""
+Single-flight de-duplication of identical upstream calls
+
+Concurrent callers with the same key inside a worker wait on one in-flight
+call and share its result (or exception). With SINGLE_FLIGHT_DISTRIBUTED
+enabled, workers also coordinate through a short-lived lease document in
+Mongo: the lease holder calls the upstream while the others poll for the
+result it publishes (the summary cache), taking over if the lease expires.
+
+Waiting never outlasts the caller's deadline: a follower that runs out of
+budget gets TimeoutError and can fall back instead of calling late.
+"""
+import os
+import time
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, database=None, distributed=None, lease_seconds=None, poll_interval=None):
+        self.database = database
+        if distributed is None:
+            distributed = os.getenv('SINGLE_FLIGHT_DISTRIBUTED', 'false').lower() in ('1', 'true', 'yes')
+        self.distributed = distributed
+        self.lease_seconds = lease_seconds or float(os.getenv('SINGLE_FLIGHT_LEASE_SECONDS', 40))
+        self.poll_interval = poll_interval or float(os.getenv('SINGLE_FLIGHT_POLL_INTERVAL', 0.25))
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.leaders = 0
+        self.followers = 0
+        self.remote_followers = 0
+
+    def do(self, key, fn, lookup=None, deadline=None):
+        """Run fn() once for all concurrent callers with the same key.
+
+        lookup() should return the published result for key (or None); it is
+        only used for cross-worker coordination. deadline is the caller's
+        remaining budget in seconds; waiting on another caller past it
+        raises TimeoutError. Returns (result, shared).
+        """
+        deadline_at = time.monotonic() + deadline if deadline is not None else None
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+                self.leaders += 1
+            else:
+                self.followers += 1
+
+        if not leader:
+            timeout = max(0, deadline_at - time.monotonic()) if deadline_at is not None else None
+            if not call.event.wait(timeout):
+                raise TimeoutError(f"Deadline passed waiting on in-flight call for {key}")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result, shared = self._run(key, fn, lookup, deadline_at)
+            return call.result, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.event.set()
+
+    def _run(self, key, fn, lookup, deadline_at=None):
+        if not self.distributed or self.database is None or lookup is None:
+            return fn(), False
+
+        lease_wait_until = time.monotonic() + self.lease_seconds
+        while True:
+            if self.database.acquire_lease(key, self.lease_seconds):
+                try:
+                    # Another worker may have published between our polls
+                    result = lookup()
+                    if result is not None:
+                        self.remote_followers += 1
+                        return result, True
+                    return fn(), False
+                finally:
+                    self.database.release_lease(key)
+
+            result = lookup()
+            if result is not None:
+                self.remote_followers += 1
+                return result, True
+
+            now = time.monotonic()
+            if deadline_at is not None and now >= deadline_at:
+                raise TimeoutError(f"Deadline passed waiting on upstream lease for {key}")
+            if now >= lease_wait_until:
+                logger.warning("Timed out waiting on upstream lease, calling upstream directly")
+                return fn(), False
+            sleep_until = now + self.poll_interval
+            if deadline_at is not None:
+                sleep_until = min(sleep_until, deadline_at)
+            time.sleep(sleep_until - now)
+
+    def stats(self):
+        return {
+            'distributed': self.distributed,
+            'in_flight': len(self._calls),
+            'leaders': self.leaders,
+            'followers': self.followers,
+            'remote_followers': self.remote_followers
+        }
@@ -1,3 +1,4 @@
 #!/bin/bash
 # Start script for Render deployment
-exec gunicorn --bind 0.0.0.0:$PORT index:application
+# Workers, threads and MongoDB pool sizes come from gunicorn.conf.py
+exec gunicorn -c gunicorn.conf.py index:application
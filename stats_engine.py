@@ -0,0 +1,47 @@
+"""
+Usage statistics for /api/admin/stats
+
+Totals (users, premium users, generations) are materialized counters in the
+`stats` collection, incremented by Database as users sign up, upgrade and
+generate, and seeded from the collections once if missing. The 24-hour
+activity figures come from a single $facet aggregation over indexed range
+matches. Results are cached per worker for STATS_CACHE_TTL seconds, so
+dashboard polling costs at most two small queries per interval regardless of
+collection size.
+"""
+import os
+import logging
+from datetime import datetime, timedelta
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+COUNTER_FIELDS = ['total_users', 'premium_users', 'total_generations']
+
+
+class StatsEngine:
+    def __init__(self, database, ttl=None):
+        self.database = database
+        self.cache = TTLCache(1, ttl if ttl is not None else float(os.getenv('STATS_CACHE_TTL', 30)))
+
+    def get(self):
+        cached = self.cache.get('usage')
+        if cached is not None:
+            return cached
+
+        counters = self.database.get_stats_counters()
+        if counters is None or not counters.get('seeded'):
+            counters = self.database.seed_stats_counters()
+        if counters is None:
+            return {}
+
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        recent = self.database.count_recent_activity(yesterday)
+
+        stats = {field: counters.get(field, 0) for field in COUNTER_FIELDS}
+        stats.update(recent)
+        self.cache.set('usage', stats)
+        return stats
+
+    def invalidate(self):
+        self.cache.clear()
@@ -0,0 +1,133 @@
+"""
+Structured, non-blocking logging
+
+configure_logging() routes every log record through a QueueHandler, so the
+request thread only enqueues the record; a QueueListener thread formats it
+(as a JSON line by default) and writes it out.
+
+log_event() is the cheap way to log from hot paths: it returns before doing
+any work when the level is disabled, applies per-event sampling from
+LOG_SAMPLE_RATES (e.g. "user_lookup=0.01,usage_status=0.1"), and passes
+structured fields that are only serialized by the listener thread. Debug
+events can therefore stay in the code at negligible cost.
+"""
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+_listener = None
+
+
+def _parse_sample_rates(value):
+    rates = {}
+    for item in (value or '').split(','):
+        if '=' in item:
+            event, rate = item.split('=', 1)
+            try:
+                rates[event.strip()] = float(rate)
+            except ValueError:
+                continue
+    return rates
+
+
+# event name -> fraction of events kept; filled by configure_logging() so
+# values from .env are picked up
+SAMPLE_RATES = {}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; structured fields are merged in"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage()
+        }
+        event = getattr(record, 'event', None)
+        if event:
+            entry['event'] = event
+        fields = getattr(record, 'fields', None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Classic text lines with structured fields appended as key=value"""
+
+    def __init__(self):
+        super().__init__('%(levelname)s:%(name)s:%(message)s')
+
+    def format(self, record):
+        line = super().format(record)
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _InProcessQueueHandler(QueueHandler):
+    # The stock prepare() formats the record on the calling thread so it can
+    # be pickled; the queue never leaves this process, so defer all
+    # formatting to the listener thread instead.
+    def prepare(self, record):
+        return record
+
+
+def configure_logging():
+    """Install the queue-backed root handler (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return
+
+    SAMPLE_RATES.update(_parse_sample_rates(os.getenv('LOG_SAMPLE_RATES')))
+    level = getattr(logging, os.getenv('LOG_LEVEL', 'INFO').upper(), logging.INFO)
+    formatter = JsonFormatter() if os.getenv('LOG_FORMAT', 'json') == 'json' else TextFormatter()
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_InProcessQueueHandler(log_queue))
+    root.setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=False)
+    _listener.start()
+    atexit.register(_stop_listener)
+    if hasattr(os, 'register_at_fork'):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _stop_listener():
+    _listener.stop()
+
+
+def _restart_listener():
+    # The listener thread does not survive a fork (gunicorn --preload);
+    # without a new one, records from the worker would pile up unwritten
+    global _listener
+    _listener = QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=False)
+    _listener.start()
+
+
+def log_event(logger, event, level=logging.INFO, message=None, **fields):
+    """Log a structured event, subject to level and per-event sampling"""
+    if not logger.isEnabledFor(level):
+        return
+    rate = SAMPLE_RATES.get(event)
+    if rate is not None and random.random() >= rate:
+        return
+    logger.log(level, message or event, extra={'event': event, 'fields': fields})
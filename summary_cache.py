@@ -0,0 +1,76 @@
+"""
+Content-addressed cache for generated resume summaries
+
+Profiles are normalized (whitespace collapsed, case folded) and hashed, so
+inputs that differ only in formatting share one entry. Lookups go through a
+per-worker LRU first and fall back to the Mongo `summary_cache` collection,
+whose entries expire through a TTL index.
+"""
+import os
+import json
+import hashlib
+import logging
+from ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+PROFILE_FIELDS = ['current_job_title', 'job_description', 'years_experience',
+                  'achievements', 'technical_skills', 'education']
+
+
+def normalize_profile(data):
+    """Normalize the six profile fields the same way clean_summary tidies text"""
+    return {
+        field: ' '.join(str(data.get(field, '')).split()).casefold()
+        for field in PROFILE_FIELDS
+    }
+
+
+def summary_cache_key(data):
+    """Stable hash of the normalized profile"""
+    normalized = json.dumps(normalize_profile(data), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, database=None, max_size=None, ttl=None):
+        self.database = database
+        self.ttl = ttl if ttl is not None else int(os.getenv('SUMMARY_CACHE_TTL', 86400))
+        self.local = TTLCache(
+            max_size if max_size is not None else int(os.getenv('SUMMARY_CACHE_SIZE', 512)),
+            self.ttl
+        )
+        self.remote_hits = 0
+
+    def get(self, data):
+        """Return cached summaries for this profile, or None"""
+        if self.ttl <= 0:
+            return None
+
+        key = summary_cache_key(data)
+        summaries = self.local.get(key)
+        if summaries is not None:
+            return summaries
+
+        if self.database is not None:
+            summaries = self.database.get_cached_summaries(key)
+            if summaries:
+                self.remote_hits += 1
+                self.local.set(key, summaries)
+                return list(summaries)
+
+        return None
+
+    def set(self, data, summaries):
+        if self.ttl <= 0:
+            return
+
+        key = summary_cache_key(data)
+        self.local.set(key, summaries)
+        if self.database is not None:
+            self.database.store_cached_summaries(key, summaries)
+
+    def stats(self):
+        stats = self.local.stats()
+        stats['remote_hits'] = self.remote_hits
+        return stats
@@ -0,0 +1,47 @@
+import threading
+
+from background import BufferedWriter
+
+
+class Recorder(BufferedWriter):
+    thread_name = 'test-flusher'
+
+    def __init__(self, flush_interval):
+        super().__init__(flush_interval)
+        self.written = []
+
+    def add(self, key, value):
+        self.ensure_flusher()
+        with self._lock:
+            self._pending[key] = value
+
+    def write_pending(self, pending):
+        self.written.append(pending)
+
+
+def flusher_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'test-flusher']
+
+
+def test_zero_interval_flushes_per_request_without_a_thread():
+    recorder = Recorder(flush_interval=0)
+    recorder.add('a', 1)
+    assert recorder.flush_per_request
+    assert flusher_threads() == []
+    assert recorder.pending_count == 1
+
+    recorder.flush()
+    assert recorder.written == [{'a': 1}]
+    assert recorder.pending_count == 0
+
+
+def test_positive_interval_flushes_in_the_background():
+    recorder = Recorder(flush_interval=0.01)
+    recorder.add('a', 1)
+    assert not recorder.flush_per_request
+    recorder.wake()
+    for _ in range(200):
+        if recorder.written:
+            break
+        threading.Event().wait(0.01)
+    assert recorder.written == [{'a': 1}]
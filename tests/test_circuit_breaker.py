@@ -0,0 +1,101 @@
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+
+@pytest.fixture
+def clock(monkeypatch, fake_clock):
+    monkeypatch.setattr(circuit_breaker, 'time', fake_clock)
+    return fake_clock
+
+
+def make_breaker():
+    return CircuitBreaker(failure_rate=0.5, slow_call_seconds=2, min_calls=4,
+                          window_seconds=60, cooldown_seconds=30)
+
+
+def fail():
+    raise RuntimeError("upstream down")
+
+
+def trip(breaker):
+    for _ in range(breaker.min_calls):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+
+
+def test_stays_closed_below_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(breaker.min_calls - 1):
+        with pytest.raises(RuntimeError):
+            breaker.call(fail)
+    assert breaker.state == CLOSED
+
+
+def test_opens_at_failure_rate_and_fails_fast(clock):
+    breaker = make_breaker()
+    breaker.call(lambda: 'ok')
+    breaker.call(lambda: 'ok')
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    breaker.record(False, 0.1)
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError):
+        breaker.call(lambda: calls.append(1))
+    assert calls == []
+    assert breaker.stats()['rejected'] == 1
+
+
+def test_slow_successes_count_as_failures(clock):
+    breaker = make_breaker()
+    for _ in range(breaker.min_calls):
+        breaker.record(True, breaker.slow_call_seconds)
+    assert breaker.state == OPEN
+
+
+def test_failures_outside_the_window_are_forgotten(clock):
+    breaker = make_breaker()
+    for _ in range(breaker.min_calls - 1):
+        breaker.record(False, 0.1)
+    clock.advance(breaker.window_seconds + 1)
+    breaker.record(False, 0.1)
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 1
+
+
+def test_half_open_lets_exactly_one_trial_through(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(breaker.cooldown_seconds - 1)
+    assert not breaker.allow_request()
+
+    clock.advance(1)
+    assert breaker.allow_request()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow_request()
+
+
+def test_successful_trial_closes_the_breaker(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(breaker.cooldown_seconds)
+    assert breaker.call(lambda: 'ok') == 'ok'
+    assert breaker.state == CLOSED
+    assert breaker.stats()['window_calls'] == 0
+
+
+def test_failed_trial_reopens_for_another_cooldown(clock):
+    breaker = make_breaker()
+    trip(breaker)
+    clock.advance(breaker.cooldown_seconds)
+    with pytest.raises(RuntimeError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    clock.advance(breaker.cooldown_seconds - 1)
+    assert not breaker.allow_request()
+    clock.advance(1)
+    assert breaker.allow_request()
@@ -0,0 +1,84 @@
+import time
+import threading
+
+import pytest
+
+from hedging import HedgedCaller, LatencyTracker, DeadlineExceeded
+
+
+def test_latency_percentile():
+    tracker = LatencyTracker()
+    assert tracker.percentile(95) is None
+    for value in range(1, 101):
+        tracker.record(value / 100)
+    assert tracker.percentile(50) == pytest.approx(0.51)
+    assert tracker.percentile(95) == pytest.approx(0.95)
+
+
+def test_hedge_delay_uses_default_until_enough_samples():
+    caller = HedgedCaller(hedge_delay=3, min_samples=5)
+    for _ in range(4):
+        caller.latency.record(0.2)
+    assert caller.hedge_delay() == 3
+    caller.latency.record(0.2)
+    assert caller.hedge_delay() == pytest.approx(0.2)
+
+
+def test_fast_call_is_not_hedged():
+    caller = HedgedCaller(max_workers=4, hedge_delay=1)
+    assert caller.call(lambda: 'ok', deadline=2) == 'ok'
+    assert caller.stats()['hedges_sent'] == 0
+
+
+def test_slow_primary_is_hedged_and_the_hedge_wins():
+    caller = HedgedCaller(max_workers=4, hedge_delay=0.05)
+    release_primary = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) == 1:
+            release_primary.wait(2)
+            return 'primary'
+        return 'hedge'
+
+    try:
+        assert caller.call(fn, deadline=2) == 'hedge'
+    finally:
+        release_primary.set()
+    stats = caller.stats()
+    assert (stats['hedges_sent'], stats['hedge_wins']) == (1, 1)
+    assert len(calls) == 2
+
+
+def test_deadline_exceeded_when_nothing_answers():
+    caller = HedgedCaller(max_workers=4, hedge_delay=0.05)
+    release = threading.Event()
+    started = time.monotonic()
+    try:
+        with pytest.raises(DeadlineExceeded):
+            caller.call(lambda: release.wait(2), deadline=0.2)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 1
+    assert caller.stats()['deadline_exceeded'] == 1
+
+
+@pytest.mark.parametrize('deadline', [0, -1])
+def test_spent_deadline_does_not_call_upstream(deadline):
+    caller = HedgedCaller(max_workers=4)
+    calls = []
+    with pytest.raises(DeadlineExceeded):
+        caller.call(lambda: calls.append(1), deadline=deadline)
+    assert calls == []
+
+
+def test_primary_error_is_raised_without_hedging():
+    caller = HedgedCaller(max_workers=4, hedge_delay=1)
+
+    def fail():
+        raise ValueError("bad response")
+
+    with pytest.raises(ValueError):
+        caller.call(fail, deadline=2)
+    assert caller.stats()['hedges_sent'] == 0
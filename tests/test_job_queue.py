@@ -0,0 +1,124 @@
+import time
+import threading
+
+from job_queue import JobQueue, SUCCEEDED, FAILED
+
+
+class FakeJobDatabase:
+    """The Database job methods over a list, counting claim attempts"""
+
+    def __init__(self):
+        self.jobs = []
+        self.claims = 0
+        self.lock = threading.Lock()
+
+    def create_job(self, job):
+        with self.lock:
+            self.jobs.append(dict(job))
+        return True
+
+    def claim_job(self, worker_id, lease_seconds):
+        with self.lock:
+            self.claims += 1
+            for job in self.jobs:
+                if job['status'] == 'queued':
+                    job.update(status='running', worker=worker_id)
+                    return dict(job)
+        return None
+
+    def update_job(self, job_id, fields):
+        with self.lock:
+            for job in self.jobs:
+                if job['_id'] == job_id:
+                    job.update(fields)
+        return True
+
+    def get_job(self, job_id):
+        with self.lock:
+            for job in self.jobs:
+                if job['_id'] == job_id:
+                    return dict(job)
+        return None
+
+
+def wait_for_status(queue, job_id, timeout=2):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job and job['status'] in (SUCCEEDED, FAILED):
+            return job
+        time.sleep(0.01)
+    return queue.get(job_id)
+
+
+def poller_threads():
+    return [thread for thread in threading.enumerate() if thread.name == 'job-poller']
+
+
+def test_get_does_not_start_the_poller():
+    queue = JobQueue(lambda job: 'ok', backend='local')
+    assert queue.get('missing') is None
+    assert queue._pid is None
+
+
+def test_local_jobs_run_on_the_pool():
+    queue = JobQueue(lambda job: job['payload'] * 2, backend='local', concurrency=2)
+    job_id = queue.submit('user-1', 21)
+    job = wait_for_status(queue, job_id)
+    assert (job['status'], job['result']) == (SUCCEEDED, 42)
+    assert queue.stats()['succeeded'] == 1
+
+
+def test_failed_job_is_marked_failed():
+    def fail(job):
+        raise ValueError("upstream down")
+
+    queue = JobQueue(fail, backend='local')
+    job = wait_for_status(queue, queue.submit('user-1', None))
+    assert (job['status'], job['error']) == (FAILED, 'Generation failed')
+
+
+def test_one_poller_runs_at_most_concurrency_jobs():
+    release = threading.Event()
+    running = []
+    peak = []
+
+    def handler(job):
+        running.append(job['_id'])
+        peak.append(len(running))
+        release.wait(2)
+        running.remove(job['_id'])
+        return 'ok'
+
+    before = len(poller_threads())
+    queue = JobQueue(handler, backend='local', concurrency=2)
+    job_ids = [queue.submit('user-1', index) for index in range(5)]
+    time.sleep(0.1)
+    assert len(poller_threads()) == before + 1
+    assert len(running) == 2
+
+    release.set()
+    assert all(wait_for_status(queue, job_id)['status'] == SUCCEEDED for job_id in job_ids)
+    assert max(peak) == 2
+
+
+def test_idle_mongo_poller_backs_off():
+    database = FakeJobDatabase()
+    queue = JobQueue(lambda job: 'ok', database=database, backend='mongo',
+                     poll_interval=0.01, max_poll_interval=0.08)
+    queue.start()
+    time.sleep(0.5)
+    # Without backoff this would be ~50 polls; with it, a few at 0.08s
+    assert database.claims < 15
+
+
+def test_mongo_submit_wakes_the_backed_off_poller():
+    database = FakeJobDatabase()
+    queue = JobQueue(lambda job: 'ok', database=database, backend='mongo',
+                     poll_interval=5, max_poll_interval=5)
+    queue.start()
+    time.sleep(0.05)
+    started = time.monotonic()
+    job = wait_for_status(queue, queue.submit('user-1', None))
+    assert job['status'] == SUCCEEDED
+    assert time.monotonic() - started < 1
@@ -0,0 +1,132 @@
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def start_leader(flight, key, fn):
+    """Run flight.do(key, fn) on a thread and wait until it is in flight"""
+    started = threading.Event()
+
+    def run():
+        started.set()
+        return flight.do(key, fn)
+
+    executor = ThreadPoolExecutor(max_workers=1)
+    future = executor.submit(run)
+    started.wait()
+    while key not in flight._calls:
+        time.sleep(0.001)
+    executor.shutdown(wait=False)
+    return future
+
+
+def test_concurrent_callers_share_one_call():
+    flight = SingleFlight(distributed=False)
+    release = threading.Event()
+    calls = []
+
+    def fn():
+        calls.append(1)
+        release.wait(2)
+        return 'result'
+
+    leader = start_leader(flight, 'key', fn)
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        followers = [executor.submit(flight.do, 'key', fn) for _ in range(3)]
+        while flight.followers < 3:
+            time.sleep(0.001)
+        release.set()
+        assert [future.result(timeout=2) for future in followers] == [('result', True)] * 3
+    assert leader.result(timeout=2) == ('result', False)
+    assert calls == [1]
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_leader_error_reaches_followers():
+    flight = SingleFlight(distributed=False)
+    release = threading.Event()
+
+    def fn():
+        release.wait(2)
+        raise ValueError("upstream failed")
+
+    leader = start_leader(flight, 'key', fn)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        follower = executor.submit(flight.do, 'key', fn)
+        while flight.followers < 1:
+            time.sleep(0.001)
+        release.set()
+        with pytest.raises(ValueError):
+            follower.result(timeout=2)
+    with pytest.raises(ValueError):
+        leader.result(timeout=2)
+
+    # The failed call is not cached
+    assert flight.do('key', lambda: 'retry') == ('retry', False)
+
+
+def test_follower_gives_up_at_its_deadline():
+    flight = SingleFlight(distributed=False)
+    release = threading.Event()
+    leader = start_leader(flight, 'key', lambda: release.wait(2) and 'late')
+    started = time.monotonic()
+    try:
+        with pytest.raises(TimeoutError):
+            flight.do('key', lambda: 'never', deadline=0.1)
+    finally:
+        release.set()
+    assert time.monotonic() - started < 1
+    assert leader.result(timeout=2) == ('late', False)
+
+
+class FakeLeases:
+    def __init__(self, held=False):
+        self.held = held
+        self.released = []
+
+    def acquire_lease(self, key, ttl_seconds):
+        return not self.held
+
+    def release_lease(self, key):
+        self.released.append(key)
+
+
+def test_distributed_lease_holder_calls_upstream_and_releases():
+    leases = FakeLeases()
+    flight = SingleFlight(leases, distributed=True, lease_seconds=5, poll_interval=0.01)
+    assert flight.do('key', lambda: 'fresh', lookup=lambda: None) == ('fresh', False)
+    assert leases.released == ['key']
+
+
+def test_distributed_follower_uses_published_result():
+    leases = FakeLeases(held=True)
+    flight = SingleFlight(leases, distributed=True, lease_seconds=5, poll_interval=0.01)
+    lookups = []
+
+    def lookup():
+        lookups.append(1)
+        return 'published' if len(lookups) >= 3 else None
+
+    assert flight.do('key', lambda: pytest.fail("upstream called"), lookup=lookup) == ('published', True)
+    assert flight.stats()['remote_followers'] == 1
+
+
+def test_distributed_follower_stops_polling_at_its_deadline():
+    leases = FakeLeases(held=True)
+    flight = SingleFlight(leases, distributed=True, lease_seconds=30, poll_interval=0.01)
+    calls = []
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        flight.do('key', lambda: calls.append(1), lookup=lambda: None, deadline=0.1)
+    assert time.monotonic() - started < 1
+    assert calls == []
+
+
+def test_distributed_follower_takes_over_when_the_lease_wait_ends():
+    leases = FakeLeases(held=True)
+    flight = SingleFlight(leases, distributed=True, lease_seconds=0.05, poll_interval=0.01)
+    assert flight.do('key', lambda: 'direct', lookup=lambda: None, deadline=5) == ('direct', False)
@@ -0,0 +1,71 @@
+import pytest
+
+import ttl_cache
+from ttl_cache import TTLCache
+
+
+@pytest.fixture
+def clock(monkeypatch, fake_clock):
+    monkeypatch.setattr(ttl_cache, 'time', fake_clock)
+    return fake_clock
+
+
+def test_hit_and_miss_are_counted(clock):
+    cache = TTLCache(max_size=10, ttl=5)
+    assert cache.get('a') is None
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 1, 0.5)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(max_size=10, ttl=5)
+    cache.set('a', 1)
+    clock.advance(4.9)
+    assert cache.get('a') == 1
+    clock.advance(0.2)
+    assert cache.get('a') is None
+    assert cache.stats()['size'] == 0
+
+
+def test_least_recently_used_entry_is_evicted(clock):
+    cache = TTLCache(max_size=2, ttl=5)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1
+    assert cache.get('c') == 3
+
+
+def test_returned_values_are_copies(clock):
+    cache = TTLCache(max_size=10, ttl=5)
+    value = {'count': 1}
+    cache.set('a', value)
+    value['count'] = 2
+    cache.get('a')['count'] = 3
+    assert cache.get('a') == {'count': 1}
+
+
+def test_patch_keeps_the_original_expiry(clock):
+    cache = TTLCache(max_size=10, ttl=5)
+    cache.set('a', {'count': 1})
+    clock.advance(4)
+    cache.patch('a', lambda value: {**value, 'count': value['count'] + 1})
+    assert cache.get('a') == {'count': 2}
+    clock.advance(1.5)
+    assert cache.get('a') is None
+
+
+def test_patch_ignores_missing_keys(clock):
+    cache = TTLCache(max_size=10, ttl=5)
+    cache.patch('missing', lambda value: pytest.fail("update called for a missing key"))
+    assert cache.get('missing') is None
+
+
+def test_zero_size_or_ttl_disables_the_cache(clock):
+    for cache in (TTLCache(max_size=0, ttl=5), TTLCache(max_size=10, ttl=0)):
+        cache.set('a', 1)
+        assert cache.get('a') is None
@@ -0,0 +1,130 @@
+"""
+Pooled HTTP client for the resume summary upstream API
+
+Keeps one requests.Session per worker process so connections to the API
+Gateway endpoint are reused (keep-alive) instead of paying a TCP + TLS
+handshake on every generation. The session is rebuilt in the child after a
+fork, since pooled sockets must never be shared between gunicorn workers.
+prewarm() opens the first connection in the background at startup so the
+first generation does not pay for DNS, TCP and TLS either. requests is
+imported when the first session is built, not when this module is.
+"""
+import os
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class UpstreamError(Exception):
+    """The upstream API failed or returned an unusable response"""
+
+
+class UpstreamClient:
+    def __init__(self, pool_size=None, connect_timeout=None, read_timeout=None):
+        # Never smaller than the hedge pool, whose threads all call through here
+        self.pool_size = pool_size or max(
+            int(os.getenv('UPSTREAM_POOL_SIZE', 10)),
+            int(os.getenv('HEDGE_POOL_SIZE') or 0)
+        )
+        self.connect_timeout = connect_timeout or float(os.getenv('UPSTREAM_CONNECT_TIMEOUT', 5))
+        self.read_timeout = read_timeout or float(os.getenv('UPSTREAM_READ_TIMEOUT', 30))
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self.requests_sent = 0
+        self.sessions_created = 0
+        self.prewarmed = False
+
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    @property
+    def timeout(self):
+        return (self.connect_timeout, self.read_timeout)
+
+    def _reset(self):
+        """Drop the inherited session; the child builds its own on first use"""
+        self._lock = threading.Lock()
+        self._session = None
+        self._pid = None
+        self.prewarmed = False
+
+    def _build_session(self):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=self.pool_size,
+            pool_maxsize=self.pool_size,
+            pool_block=False
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers['Connection'] = 'keep-alive'
+        return session
+
+    @property
+    def session(self):
+        pid = os.getpid()
+        if self._session is None or self._pid != pid:
+            with self._lock:
+                if self._session is None or self._pid != pid:
+                    self._session = self._build_session()
+                    self._pid = pid
+                    self.sessions_created += 1
+                    logger.info(f"Created upstream HTTP session (pool size {self.pool_size}) in pid {pid}")
+        return self._session
+
+    def post(self, url, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        self.requests_sent += 1
+        return self.session.post(url, **kwargs)
+
+    def prewarm(self, url):
+        """Open a pooled connection to url's host on a daemon thread. Any
+        HTTP response counts: only the handshake matters."""
+        def run():
+            import requests
+            try:
+                self.session.head(url, timeout=self.timeout).close()
+                self.prewarmed = True
+            except requests.RequestException as e:
+                logger.warning(f"Upstream prewarm failed: {e}")
+
+        threading.Thread(target=run, name='upstream-prewarm', daemon=True).start()
+
+    def close(self):
+        with self._lock:
+            if self._session is not None:
+                self._session.close()
+            self._session = None
+            self._pid = None
+
+    def stats(self):
+        """Connection-pool usage for the current worker"""
+        pools = []
+        session = self._session
+        if session is not None and self._pid == os.getpid():
+            adapter = session.get_adapter('https://')
+            for key in list(adapter.poolmanager.pools.keys()):
+                pool = adapter.poolmanager.pools.get(key)
+                if pool is None:
+                    continue
+                pools.append({
+                    'host': pool.host,
+                    'connections_opened': pool.num_connections,
+                    'requests': pool.num_requests,
+                    'idle_connections': sum(1 for conn in list(pool.pool.queue) if conn is not None) if pool.pool else 0
+                })
+
+        return {
+            'pool_size': self.pool_size,
+            'connect_timeout': self.connect_timeout,
+            'read_timeout': self.read_timeout,
+            'requests_sent': self.requests_sent,
+            'sessions_created': self.sessions_created,
+            'prewarmed': self.prewarmed,
+            'pools': pools
+        }
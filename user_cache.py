@@ -0,0 +1,17 @@
+"""
+In-process user profile cache
+
+A small LRU with a per-entry TTL that holds the ProfileView returned by
+Database.get_user_by_id. Each gunicorn worker keeps its own copy, so the TTL
+is kept short to bound how stale a profile can get across workers.
+"""
+import os
+from ttl_cache import TTLCache
+
+
+class UserCache(TTLCache):
+    def __init__(self, max_size=None, ttl=None):
+        super().__init__(
+            max_size if max_size is not None else int(os.getenv('USER_CACHE_SIZE', 1024)),
+            ttl if ttl is not None else float(os.getenv('USER_CACHE_TTL', 5))
+        )
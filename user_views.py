@@ -0,0 +1,82 @@
+"""
+Typed, read-only views of a users document
+
+Each view names the fields its callers read and is fetched with an
+inclusion projection of exactly those fields, so a quota check does not
+pull the password hash or the legacy `generations` array (which grows with
+every generation) across the wire:
+  - AuthView: login (identity, password hash, last_active)
+  - QuotaView: free-trial checks and reservations
+  - ProfileView: the logged-in user (quota plus name and email); what
+    Database.get_user_by_id returns and the user cache holds
+
+Views use __slots__ and are immutable; replace() returns an updated copy,
+so cached instances can be shared between request threads.
+"""
+from datetime import datetime
+
+
+class UserView:
+    __slots__ = ()
+    # field -> value used when the document does not have it
+    FIELDS = {}
+    PROJECTION = {'_id': False}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.PROJECTION = {'_id': False, **{field: True for field in cls.FIELDS}}
+
+    def __init__(self, **values):
+        for field, default in self.FIELDS.items():
+            object.__setattr__(self, field, values.get(field, default))
+
+    @classmethod
+    def from_document(cls, document):
+        """View of a users document; fields the view does not list are dropped"""
+        if document is None:
+            return None
+        return cls(**document)
+
+    def replace(self, **changes):
+        return type(self)(**{**self.to_dict(), **changes})
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only, use replace()")
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(user_id={getattr(self, 'user_id', None)!r})"
+
+
+class AuthView(UserView):
+    FIELDS = {'user_id': None, 'name': '', 'email': '', 'password_hash': None, 'last_active': None}
+    __slots__ = tuple(FIELDS)
+
+    user_id: str
+    name: str
+    email: str
+    password_hash: str | None
+    last_active: datetime | None
+
+
+class QuotaView(UserView):
+    FIELDS = {'user_id': None, 'usage_count': 0, 'is_premium': False, 'last_active': None}
+    __slots__ = tuple(FIELDS)
+
+    user_id: str
+    usage_count: int
+    is_premium: bool
+    last_active: datetime | None
+
+
+class ProfileView(QuotaView):
+    FIELDS = {**QuotaView.FIELDS, 'name': '', 'email': ''}
+    __slots__ = ('name', 'email')
+
+    name: str
+    email: str